@@ -1,11 +1,17 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
-import numpy as np
 
 # Importar utilidades
-from utils.datos import init_data, get_data_copy
-from utils.filtros import filtros_locales
+from utils.datos import (
+    init_data,
+    get_table,
+    get_data_version,
+    get_memory_usage,
+    reload_data,
+)
+from utils.filtros import ORDER, filtros_locales, estadisticas_cache
+from utils.metricas import employment_rates
+from utils.cache import cache_por_seleccion, clave_seleccion, estadisticas, limpiar
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 aplicar_tema_plotly()
@@ -13,13 +19,23 @@ aplicar_tema_plotly()
 st.title("📊 Empleabilidad por Año de Graduacion")
 
 # Initialize data
-init_data()
-df_graduados = get_data_copy("Graduados")
-df_laboral = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_graduados.columns = df_graduados.columns.str.strip().str.lower()
-df_laboral.columns = df_laboral.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_graduados = get_table("Graduados")
+
+# Diagnóstico: tablas en memoria y cachés compartidas entre sesiones
+with st.sidebar.expander("Diagnóstico de datos"):
+    st.caption(f"Versión de datos: {get_data_version()}")
+    st.dataframe(get_memory_usage(), hide_index=True)
+    st.markdown("**Caché de resultados**")
+    st.json(estadisticas())
+    st.markdown("**Caché de filtros**")
+    st.json(estadisticas_cache())
+    if st.button("Vaciar caché de resultados"):
+        limpiar()
+        st.rerun()
+    if st.button("Recargar datos"):
+        reload_data()
+        st.rerun()
 
 # 2. Filtros
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_graduados)
@@ -29,114 +45,48 @@ if df_grad_filtrado.empty:
     st.stop()
 
 
-# 3. Cálculo de empleabilidad
-@st.cache_data
-def calcular_empleabilidad_por_cohorte(df_grad, df_lab, cedulas_validas):
-    """
-    Calcula la tasa de empleabilidad por cohorte (una sola universidad ya filtrada).
-    """
-    # Filtrar solo graduados válidos
-    df_grad_valido = df_grad[df_grad["cedula"].isin(cedulas_validas)].copy()
-
-    # Contar graduados por cohorte
-    graduados_por_cohorte = (
-        df_grad_valido.groupby("anio_graduacion")["cedula"]
-        .nunique()
-        .reset_index(name="total_graduados")
-    )
-
-    # Filtrar empleados (solo cédulas válidas)
-    df_lab_valido = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-
-    # Unir con cohorte para cada empleado
-    df_empleados = df_lab_valido.merge(
-        df_grad_valido[["cedula", "anio_graduacion"]],
-        on="cedula",
-        how="left",
-    )
-
-    # Contar empleados por cohorte
-    empleados_por_cohorte = (
-        df_empleados.groupby("anio_graduacion")["cedula"]
-        .nunique()
-        .reset_index(name="total_empleados")
-    )
-
-    # Combinar datos
-    resultado = graduados_por_cohorte.merge(
-        empleados_por_cohorte, on="anio_graduacion", how="left"
-    )
-    resultado["total_empleados"] = resultado["total_empleados"].fillna(0)
-    resultado["tasa_empleabilidad"] = (
-        resultado["total_empleados"] / resultado["total_graduados"] * 100
-    ).round(1)
-
-    return resultado
-
-
-@st.cache_data
-def calcular_empleabilidad_general(
-    df_grad,
-    df_lab,
-    universidad=None,
-    nivel=None,
-    facultad=None,
-    carrera=None,
-    enfasis=None,
-):
+# 3. Cálculo de empleabilidad: totales y cohortes en una sola pasada
+@cache_por_seleccion("empleabilidad")
+def calcular_empleabilidad(seleccion, filtros_sel):
     """
-    Calcula la tasa de empleabilidad general considerando los filtros seleccionados.
+    Calcula la empleabilidad general y por cohorte de los graduados filtrados
+    (todos los filtros, incluidos año y periodo), a partir de las mismas
+    personas, así que las tarjetas y el gráfico siempre coinciden. Los
+    conteos salen de los mapas de bits ({columna: valor} de los filtros).
+    `seleccion` (los filtros aplicados) es la clave de la caché.
+
+    Returns:
+    --------
+    tuple
+        ((tasa_empleabilidad, tasa_desempleo, total_graduados, total_empleados),
+         DataFrame por cohorte)
     """
-    # Filtrar según los filtros especificados
-    filtered_df = df_grad.copy()
-
-    if universidad and universidad != "Todos":
-        filtered_df = filtered_df[filtered_df["universidad"] == universidad]
-    if nivel and nivel != "Todos":
-        filtered_df = filtered_df[filtered_df["grado"] == nivel]
-    if facultad and facultad != "Todos":
-        filtered_df = filtered_df[filtered_df["facultad"] == facultad]
-    if carrera and carrera != "Todos":
-        filtered_df = filtered_df[filtered_df["carrera"] == carrera]
-    if enfasis and enfasis != "Todos":
-        filtered_df = filtered_df[filtered_df["enfasis"] == enfasis]
-
-    # Obtener cédulas únicas de graduados filtrados
-    cedulas_validas = set(filtered_df["cedula"].dropna().astype(str).unique().tolist())
-
-    # Contar total de graduados
-    total_graduados = len(cedulas_validas)
+    general, por_cohorte = employment_rates(filtros_sel, by=[[], ["anio_graduacion"]])
+    por_cohorte["tasa_empleabilidad"] = por_cohorte["tasa"].round(1)
 
-    if total_graduados == 0:
-        return 0, 0, 0
+    if general.empty or general["total_graduados"].iloc[0] == 0:
+        return (0, 0, 0, 0), por_cohorte
 
-    # Contar graduados empleados
-    cedulas_empleados = set(df_lab["cedula"].dropna().astype(str).unique().tolist())
-    empleados = len(cedulas_validas.intersection(cedulas_empleados))
+    total_graduados = int(general["total_graduados"].iloc[0])
+    total_empleados = int(general["total_empleados"].iloc[0])
 
     # Calcular tasas
-    tasa_empleabilidad = (empleados / total_graduados) * 100
+    tasa_empleabilidad = float(general["tasa"].iloc[0])
     tasa_desempleo = 100 - tasa_empleabilidad
 
-    return round(tasa_empleabilidad, 1), round(tasa_desempleo, 1), total_graduados
-
-
-# Obtener valores de los filtros seleccionados
-universidad_seleccionada = selections.get("Universidad")
-nivel_seleccionado = selections.get("Nivel")
-facultad_seleccionada = selections.get("Facultad")
-carrera_seleccionada = selections.get("Carrera")
-enfasis_seleccionado = selections.get("Enfasis")
-
-# Calcular empleabilidad general aplicando todos los filtros
-tasa_empleo, tasa_desempleo, total_graduados = calcular_empleabilidad_general(
-    df_graduados,
-    df_laboral,
-    universidad=universidad_seleccionada,
-    nivel=nivel_seleccionado,
-    facultad=facultad_seleccionada,
-    carrera=carrera_seleccionada,
-    enfasis=enfasis_seleccionado,
+    return (
+        round(tasa_empleabilidad, 1),
+        round(tasa_desempleo, 1),
+        total_graduados,
+        total_empleados,
+    ), por_cohorte
+
+
+(tasa_empleo, tasa_desempleo, total_graduados, total_empleados), df_empleabilidad = (
+    calcular_empleabilidad(
+        clave_seleccion(selections),
+        {col: selections.get(label) for label, col in ORDER},
+    )
 )
 
 # === 4. Visualización en tarjetas
@@ -181,15 +131,11 @@ with col3:
 with col4:
     tarjeta(
         "Total de Empleados",
-        f"{int(total_graduados * tasa_empleo / 100):,}",
+        f"{total_empleados:,}",
         icon="💼",
     )
 
-# 5. Calcular empleabilidad por cohorte para el gráfico
-df_empleabilidad = calcular_empleabilidad_por_cohorte(
-    df_grad_filtrado, df_laboral, cedulas_filtradas
-)
-
+# 5. Empleabilidad por cohorte para el gráfico
 if df_empleabilidad.empty:
     st.warning("No hay datos de empleabilidad para mostrar con los filtros aplicados.")
     st.stop()
@@ -0,0 +1,45 @@
+"""
+Memoria por tabla antes y después de aplicar el esquema de utils.esquema.
+
+Uso:
+    python benchmarks/bench_esquema.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.datos import REQUIRED_TABLES
+from utils.esquema import aplicar_esquema, memoria
+from utils.excel_data import load_excel_table
+
+
+def main():
+    print(
+        f"{'tabla':<18} {'filas':>8} {'antes (MB)':>11} {'después (MB)':>13} {'ahorro':>7}"
+    )
+    total_antes = total_despues = 0
+    for tabla in REQUIRED_TABLES:
+        df = load_excel_table(tabla, typed=False)
+        if df.empty:
+            print(f"{tabla:<18} {'(sin datos)':>8}")
+            continue
+        antes = memoria(df)
+        despues = memoria(aplicar_esquema(tabla, df))
+        total_antes += antes
+        total_despues += despues
+        print(
+            f"{tabla:<18} {len(df):>8,} {antes / 1e6:>11.2f} {despues / 1e6:>13.2f} "
+            f"{1 - despues / antes:>7.0%}"
+        )
+    if total_antes:
+        print(
+            f"{'TOTAL':<18} {'':>8} {total_antes / 1e6:>11.2f} {total_despues / 1e6:>13.2f} "
+            f"{1 - total_despues / total_antes:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
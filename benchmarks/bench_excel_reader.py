@@ -0,0 +1,127 @@
+"""
+Compara pd.read_excel con utils.excel_data.read_excel_streaming.
+
+Cada lectura corre en un proceso nuevo para medir su pico de memoria (RSS)
+sin interferencias. Con --rows se genera un libro sintético repitiendo las
+filas del archivo fuente hasta alcanzar ese tamaño.
+
+Uso:
+    python benchmarks/bench_excel_reader.py
+    python benchmarks/bench_excel_reader.py --file db/DataLocalizacion.xlsx --skip telefono
+    python benchmarks/bench_excel_reader.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _peak_rss_mb():
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run(method, path, skip):
+    import pandas as pd
+    from utils.excel_data import read_excel_streaming
+
+    base = _peak_rss_mb()
+    t0 = time.perf_counter()
+    if method == "read_excel":
+        df = pd.read_excel(path)
+        df = df.drop(columns=[c for c in skip if c in df.columns])
+    else:
+        df = read_excel_streaming(path, skip_columns=skip)
+    wall = time.perf_counter() - t0
+    print(
+        json.dumps(
+            {
+                "rows": len(df),
+                "cols": df.shape[1],
+                "wall_s": wall,
+                "peak_rss_mb": _peak_rss_mb(),
+                "base_rss_mb": base,
+            }
+        )
+    )
+
+
+def _make_synthetic(src, rows):
+    import openpyxl
+
+    wb_src = openpyxl.load_workbook(src, read_only=True, data_only=True)
+    data = list(wb_src.worksheets[0].iter_rows(values_only=True))
+    wb_src.close()
+    header, body = data[0], data[1:]
+
+    out = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False).name
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(header)
+    for i in range(rows):
+        ws.append(body[i % len(body)])
+    wb.save(out)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--file", default=os.path.join(ROOT, "db", "DataLaboral.xlsx"))
+    parser.add_argument("--rows", type=int, default=0, help="filas del libro sintético")
+    parser.add_argument("--skip", nargs="*", default=[], help="columnas a omitir")
+    parser.add_argument(
+        "--run", choices=["read_excel", "streaming"], help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.run:
+        _run(args.run, args.file, args.skip)
+        return
+
+    path = args.file
+    if args.rows:
+        print(f"Generando libro sintético de {args.rows:,} filas...")
+        path = _make_synthetic(args.file, args.rows)
+
+    print(f"Archivo: {path}")
+    print(
+        f"{'método':<12} {'filas':>10} {'cols':>5} {'tiempo (s)':>11} {'pico RSS (MB)':>14} {'Δ RSS (MB)':>11}"
+    )
+    try:
+        for method in ("read_excel", "streaming"):
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--run",
+                    method,
+                    "--file",
+                    path,
+                    "--skip",
+                    *args.skip,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{method:<12} {r['rows']:>10,} {r['cols']:>5} {r['wall_s']:>11.2f} "
+                f"{r['peak_rss_mb']:>14.1f} {r['peak_rss_mb'] - r['base_rss_mb']:>11.1f}"
+            )
+    finally:
+        if args.rows:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
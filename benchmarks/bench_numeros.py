@@ -0,0 +1,83 @@
+"""
+Compara to_float_safe (Series.apply, una llamada por fila) con
+to_float_series (vectorizado) sobre montos con formato local.
+
+La columna sintética mezcla textos ('9.470.000,00', '15100,00'), números y
+faltantes, y se verifica que ambos métodos den exactamente el mismo resultado.
+
+Uso:
+    python benchmarks/bench_numeros.py
+    python benchmarks/bench_numeros.py --rows 30000 3000000 --texto
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.esquema import to_float_safe, to_float_series
+
+
+def _formato_local(x):
+    entero, decimales = f"{x:,.2f}".split(".")
+    return f"{entero.replace(',', '.')},{decimales}"
+
+
+def _columna(filas, solo_texto, seed=0):
+    rng = np.random.default_rng(seed)
+    montos = np.round(rng.lognormal(13, 1.2, filas), 2)
+    tipo = rng.integers(0, 10, filas)
+    valores = np.empty(filas, dtype=object)
+    for i, (m, t) in enumerate(zip(montos, tipo)):
+        if t < 6 or solo_texto:
+            valores[i] = _formato_local(m) if t else ""
+        elif t < 8:
+            valores[i] = float(m)
+        elif t < 9:
+            valores[i] = int(m)
+        else:
+            valores[i] = None
+    col = pd.Series(valores, dtype=object)
+    return col.astype("str") if solo_texto else col
+
+
+def _medir(funcion, col):
+    t0 = time.perf_counter()
+    resultado = funcion(col)
+    return time.perf_counter() - t0, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[30_000, 3_000_000])
+    parser.add_argument(
+        "--texto", action="store_true", help="columna solo de textos (dtype str)"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'filas':>10} {'apply (s)':>10} {'vectorizado (s)':>16} {'aceleración':>12} {'iguales':>8}"
+    )
+    for filas in args.rows:
+        col = _columna(filas, args.texto)
+        t_apply, esperado = _medir(
+            lambda c: c.apply(to_float_safe).astype("float64"), col
+        )
+        t_vec, obtenido = _medir(to_float_series, col)
+        iguales = np.array_equal(
+            esperado.to_numpy(), obtenido.to_numpy(), equal_nan=True
+        )
+        print(
+            f"{filas:>10,} {t_apply:>10.3f} {t_vec:>16.3f} "
+            f"{t_apply / t_vec:>11.1f}x {str(iguales):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ import pandas as pd
 import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_table
+from utils import hechos
 from utils.filtros import filtros_locales
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
@@ -15,15 +16,8 @@ aplicar_tema_plotly()
 st.title("💰 Distribución por quintiles de patrimonio")
 
 # === 2) Carga de datos ===
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-df_inm = get_data_copy("DataInmueble")
-df_mue = get_data_copy("DataMueble")
-
-# Normalizar columnas
-for df in (df_grad, df_lab, df_inm, df_mue):
-    df.columns = df.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral", "DataInmueble", "DataMueble"])
+df_grad = get_table("Graduados")
 
 # === 3) Filtros base (una universidad) ===
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -31,95 +25,25 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
 # Mantener solo cédulas válidas del universo filtrado
-cedulas_df = (
-    df_grad_filtrado[df_grad_filtrado["cedula"].isin(cedulas_validas)][["cedula"]]
-    .drop_duplicates()
-    .copy()
+cedulas_df = df_grad_filtrado[df_grad_filtrado["cedula_id"].isin(cedulas_validas)][
+    ["cedula", "cedula_id"]
+].drop_duplicates(subset=["cedula_id"])
+
+# === 5) Ingresos (suma de TODOS sus empleos), inmuebles y muebles por persona ===
+# Vienen de la tabla de hechos por persona, calculada una vez al cargar los datos.
+# Los montos ('9.470.000,00', 25900.0...) ya llegan como float64 desde la carga
+hechos_personas = hechos.personas(
+    ["ingresos", "valor_inmueble", "valor_mueble"], cedulas_df["cedula_id"]
 )
 
-
-# === 4) Helper: convertir números con coma/decimal a float robusto ===
-def to_float_safe(s):
-    """
-    Convierte valores tipo decimal con posibles formatos de Excel/SQL:
-    - '9.470.000,00' -> 9470000.00
-    - '15100,00'     -> 15100.00
-    - 25900.0        -> 25900.0
-    - None/NaN       -> NaN
-    """
-    if pd.isna(s):
-        return np.nan
-    try:
-        # Si ya es numérico
-        if isinstance(s, (int, float, np.number)):
-            return float(s)
-        s = str(s).strip()
-        if s == "":
-            return np.nan
-        # eliminar separadores de miles '.', cambiar coma decimal por punto
-        s = s.replace(".", "").replace(",", ".")
-        return float(s)
-    except Exception:
-        return np.nan
-
-
-# === 5) Agregar ingresos laborales por persona (suma de TODOS sus empleos) ===
-ingresos = pd.DataFrame({"cedula": [], "ingreso_aproximado": []})
-if not df_lab.empty and "ingreso_aproximado" in df_lab.columns:
-    dfl = df_lab[df_lab["cedula"].isin(cedulas_validas)][
-        ["cedula", "ingreso_aproximado"]
-    ].copy()
-    dfl["ingreso_aproximado"] = dfl["ingreso_aproximado"].apply(to_float_safe)
-    dfl = dfl.dropna(subset=["ingreso_aproximado"])
-    if not dfl.empty:
-        ingresos = (
-            dfl.groupby("cedula", as_index=False)["ingreso_aproximado"]
-            .sum()
-            .rename(columns={"ingreso_aproximado": "ingresos"})
-        )
-
-# === 6) Agregar valor de inmuebles por persona (suma) ===
-inmuebles = pd.DataFrame({"cedula": [], "valor_fiscal": []})
-if not df_inm.empty and "valor_fiscal" in df_inm.columns:
-    dfi = df_inm[df_inm["cedula"].isin(cedulas_validas)][
-        ["cedula", "valor_fiscal"]
-    ].copy()
-    dfi["valor_fiscal"] = dfi["valor_fiscal"].apply(to_float_safe)
-    dfi = dfi.dropna(subset=["valor_fiscal"])
-    if not dfi.empty:
-        inmuebles = (
-            dfi.groupby("cedula", as_index=False)["valor_fiscal"]
-            .sum()
-            .rename(columns={"valor_fiscal": "valor_inmueble"})
-        )
-
-# === 7) Agregar valor de muebles por persona (suma) ===
-muebles = pd.DataFrame({"cedula": [], "valor_contrato": []})
-if not df_mue.empty and "valor_contrato" in df_mue.columns:
-    dfm = df_mue[df_mue["cedula"].isin(cedulas_validas)][
-        ["cedula", "valor_contrato"]
-    ].copy()
-    dfm["valor_contrato"] = dfm["valor_contrato"].apply(to_float_safe)
-    dfm = dfm.dropna(subset=["valor_contrato"])
-    if not dfm.empty:
-        muebles = (
-            dfm.groupby("cedula", as_index=False)["valor_contrato"]
-            .sum()
-            .rename(columns={"valor_contrato": "valor_mueble"})
-        )
-
 # === 8) Unir todo al universo de cédulas filtradas ===
-patrimonio = (
-    cedulas_df.merge(ingresos, on="cedula", how="left")
-    .merge(inmuebles, on="cedula", how="left")
-    .merge(muebles, on="cedula", how="left")
-)
+patrimonio = cedulas_df.merge(hechos_personas, on="cedula_id", how="left")
 
 for col in ["ingresos", "valor_inmueble", "valor_mueble"]:
     if col not in patrimonio.columns:
@@ -143,7 +67,7 @@ if (
 labels_all = ["Q1", "Q2", "Q3", "Q4", "Q5"]
 patrimonio["quintil"] = pd.NA  # inicializar
 
-vals = patrimonio[["cedula", "patrimonio_total"]].copy()
+vals = patrimonio[["cedula_id", "patrimonio_total"]]
 mask_zero = vals["patrimonio_total"] <= 0
 mask_pos = ~mask_zero
 
@@ -155,7 +79,7 @@ if n_zero > 0 and n_pos > 0:
     patrimonio.loc[mask_zero, "quintil"] = "Q1"
 
     # Q2–Q5: repartir positivos en 4 cuartiles por frecuencia (estable con rank)
-    pos_vals = vals.loc[mask_pos].copy()
+    pos_vals = vals.loc[mask_pos]
     try:
         pos_vals["qpos"] = pd.qcut(
             pos_vals["patrimonio_total"].rank(method="average"),
@@ -175,7 +99,9 @@ if n_zero > 0 and n_pos > 0:
             labels_per_index[idxs] = lab[i]
         pos_vals["qpos"] = labels_per_index
 
-    patrimonio = patrimonio.merge(pos_vals[["cedula", "qpos"]], on="cedula", how="left")
+    patrimonio = patrimonio.merge(
+        pos_vals[["cedula_id", "qpos"]], on="cedula_id", how="left"
+    )
     patrimonio["quintil"] = patrimonio["quintil"].fillna(patrimonio.pop("qpos"))
 
 else:
@@ -186,7 +112,7 @@ else:
         )
     except ValueError:
         pat_sorted = (
-            patrimonio[["cedula", "patrimonio_total"]]
+            patrimonio[["cedula_id", "patrimonio_total"]]
             .sort_values("patrimonio_total", kind="mergesort")
             .reset_index(drop=True)
         )
@@ -198,8 +124,8 @@ else:
             labels_per_index[idxs] = lab[i]
         pat_sorted["quintil"] = labels_per_index
         patrimonio = patrimonio.merge(
-            pat_sorted[["cedula", "quintil"]],
-            on="cedula",
+            pat_sorted[["cedula_id", "quintil"]],
+            on="cedula_id",
             how="left",
             suffixes=("", "_new"),
         )
@@ -256,7 +182,7 @@ else:
 
 # === 10) Resumen por quintil (conteo y %) ===
 resumen = (
-    patrimonio.groupby("quintil")["cedula"]
+    patrimonio.groupby("quintil")["cedula_id"]
     .nunique()
     .reset_index(name="personas")
     .sort_values("quintil")  # Q1..Q5
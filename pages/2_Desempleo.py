@@ -1,11 +1,12 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 import numpy as np
 
 # Importar utilidades
-from utils.datos import init_data, get_data_copy
-from utils.filtros import filtros_locales
+from utils.datos import init_data, get_table
+from utils.filtros import ORDER, filtros_locales
+from utils.metricas import employment_rates
+from utils.cache import cache_por_seleccion, clave_seleccion
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 # ALWAYS apply custom theme
@@ -15,14 +16,8 @@ aplicar_tema_plotly()
 st.title("📉 Desempleabilidad por Año de Graduacion")
 
 # Initialize data
-init_data()
-df_graduados = get_data_copy("Graduados")
-df_laboral = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_graduados.columns = df_graduados.columns.str.strip().str.lower()
-df_laboral.columns = df_laboral.columns.str.strip().str.lower()
-
+init_data(["Graduados", "DataLaboral"])
+df_graduados = get_table("Graduados")
 # 2. Filtros
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_graduados)
 
@@ -32,46 +27,15 @@ if df_grad_filtrado.empty:
 
 
 # 3. Cálculo de desempleabilidad
-@st.cache_data
-def calcular_desempleabilidad_por_cohorte(df_grad, df_lab, cedulas_validas):
+@cache_por_seleccion("desempleabilidad_por_cohorte")
+def calcular_desempleabilidad_por_cohorte(seleccion, filtros_sel):
     """
     Calcula la tasa de desempleabilidad por cohorte (una sola universidad ya filtrada).
     DataLaboral contiene únicamente personas empleadas al corte.
+    `seleccion` (los filtros aplicados) es la clave de la caché.
     """
-    # 1) Graduados válidos (denominador)
-    df_grad_valido = df_grad[df_grad["cedula"].isin(cedulas_validas)].copy()
-
-    graduados_por_cohorte = (
-        df_grad_valido.groupby("anio_graduacion")["cedula"]
-        .nunique()
-        .reset_index(name="total_graduados")
-    )
-
-    # 2) Empleados (numerador para empleo) → luego derivamos no empleados
-    df_lab_valido = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-
-    df_empleados = df_lab_valido.merge(
-        df_grad_valido[["cedula", "anio_graduacion"]],
-        on="cedula",
-        how="left",
-    )
-
-    empleados_por_cohorte = (
-        df_empleados.groupby("anio_graduacion")["cedula"]
-        .nunique()
-        .reset_index(name="total_empleados")
-    )
-
-    # 3) Combinar y calcular no empleados y tasa de desempleabilidad
-    resultado = graduados_por_cohorte.merge(
-        empleados_por_cohorte, on="anio_graduacion", how="left"
-    )
-    resultado["total_empleados"] = resultado["total_empleados"].fillna(0)
-
-    # Asegurar no negativos si hubiera alguna inconsistencia
-    resultado["total_no_empleados"] = (
-        resultado["total_graduados"] - resultado["total_empleados"]
-    ).clip(lower=0)
+    # Graduados, empleados y no empleados únicos por cohorte (mapas de bits)
+    resultado = employment_rates(filtros_sel, by=["anio_graduacion"])
 
     # Evitar división por cero
     resultado["tasa_desempleabilidad"] = np.where(
@@ -85,7 +49,7 @@ def calcular_desempleabilidad_por_cohorte(df_grad, df_lab, cedulas_validas):
 
 # Calcular
 df_desempleabilidad = calcular_desempleabilidad_por_cohorte(
-    df_grad_filtrado, df_laboral, cedulas_filtradas
+    clave_seleccion(selections), {col: selections.get(label) for label, col in ORDER}
 )
 
 if df_desempleabilidad.empty:
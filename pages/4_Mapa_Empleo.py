@@ -1,6 +1,5 @@
 import json
 import os
-import unicodedata
 
 import streamlit as st
 import plotly.express as px
@@ -8,9 +7,11 @@ import pandas as pd
 import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_table
+from utils import bitmaps
 from utils.filtros import filtros_locales
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
+from utils.esquema import normalizar_texto
 
 # === Tema ===
 aplicar_tema_plotly()
@@ -19,14 +20,8 @@ aplicar_tema_plotly()
 st.title("🗺️ Mapa de Empleo por Provincia")
 
 # === 2) Carga de datos ===
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-df_loc = get_data_copy("DataLocalizacion")
-
-# Normalizar columnas
-for df in (df_grad, df_lab, df_loc):
-    df.columns = df.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral", "DataLocalizacion"])
+df_grad = get_table("Graduados")
 
 # === 3) Filtros base (una universidad) ===
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -34,73 +29,29 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
 
-# === 4) Helper: normalizar nombres de provincia ===
-def _norm_str(s: str) -> str:
-    if pd.isna(s):
-        return ""
-    s = str(s).strip()
-    s = "".join(
-        c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn"
-    )
-    return s.upper()
-
-
 # === 5) Denominador: graduados (únicos por provincia) ===
-# Tomamos la provincia desde DataLocalizacion para las cédulas válidas.
-df_loc_ok = df_loc[df_loc["cedula"].isin(cedulas_validas)].copy()
-if "provincia" not in df_loc_ok.columns:
+# Provincia de cada persona desde DataLocalizacion, como mapas de bits por
+# cedula_id: graduados de una provincia = |filtradas AND provincia|.
+mapas_prov = bitmaps.provincia()
+if mapas_prov is None:
     st.error("No se encontró la columna 'provincia' en DataLocalizacion.")
     st.stop()
 
-df_loc_ok["provincia_norm"] = df_loc_ok["provincia"].apply(_norm_str)
-df_loc_ok = df_loc_ok.replace({"provincia_norm": {"": np.nan}}).dropna(
-    subset=["provincia_norm"]
-)
-
-# Como cada cédula tiene una sola provincia, basta con deduplicar por cédula
-loc_map = df_loc_ok[["cedula", "provincia_norm"]].drop_duplicates(subset=["cedula"])
-
-# Graduados de la universidad filtrada (por cédula válidas) con su provincia
-grad_con_prov = (
-    df_grad_filtrado[df_grad_filtrado["cedula"].isin(cedulas_validas)][["cedula"]]
-    .drop_duplicates()
-    .merge(loc_map, on="cedula", how="left")
-    .dropna(subset=["provincia_norm"])
-)
-
-denominador = (
-    grad_con_prov.groupby("provincia_norm")["cedula"]
-    .nunique()
-    .reset_index(name="total_graduados")
-)
+filtradas = bitmaps.desde_ids(cedulas_validas)
+provincias, totales = bitmaps.conteo_por_valor(mapas_prov, filtradas)
+denominador = pd.DataFrame({"provincia_norm": provincias, "total_graduados": totales})
 
 # === 6) Numerador: empleados únicos por provincia ===
-df_lab_ok = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-# Si existe labora_actualmente, filtramos a 'S'
-if "labora_actualmente" in df_lab_ok.columns:
-    df_lab_ok = df_lab_ok[
-        df_lab_ok["labora_actualmente"].astype(str).str.upper().str.strip() == "S"
-    ]
-
-# Mapear provincia a cada empleado
-empleados_con_prov = (
-    df_lab_ok[["cedula"]]
-    .drop_duplicates()
-    .merge(loc_map, on="cedula", how="left")
-    .dropna(subset=["provincia_norm"])
-)
-
-numerador = (
-    empleados_con_prov.groupby("provincia_norm")["cedula"]
-    .nunique()
-    .reset_index(name="total_empleados")
-)
+# Solo quienes laboran actualmente (labora_actualmente)
+empleadas = bitmaps.y(filtradas, bitmaps.laboral()["activo"])
+provincias, totales = bitmaps.conteo_por_valor(mapas_prov, empleadas)
+numerador = pd.DataFrame({"provincia_norm": provincias, "total_empleados": totales})
 
 # === 7) Combinar y calcular tasa ===
 res = denominador.merge(numerador, on="provincia_norm", how="left").fillna(
@@ -146,7 +97,7 @@ def _elegir_featureidkey(geojson, provincias_norm_set):
                 if v is None:
                     break
             if v is not None:
-                ok_vals.append(_norm_str(v))
+                ok_vals.append(normalizar_texto(v))
         inter = set(ok_vals) & provincias_norm_set
         # Si hay intersección razonable, nos quedamos con este cand
         if len(inter) >= max(1, min(3, len(provincias_norm_set) // 2)):
@@ -1,11 +1,11 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
-import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_table
+from utils.esquema import ESQUEMAS
 from utils.filtros import filtros_locales
+from utils.topk import top_k
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 # Aplicar tema global
@@ -15,13 +15,8 @@ aplicar_tema_plotly()
 st.title("🏢 Distribución por Actividad Empresa")
 
 # 2️⃣ Carga de datos
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_grad.columns = df_grad.columns.str.strip().str.lower()
-df_lab.columns = df_lab.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_grad = get_table("Graduados")
 
 # 3️⃣ Filtros
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -29,42 +24,26 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
-# 4️⃣ Filtrar DataLaboral
-dfl = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-
-# Solo empleados activos
-if "labora_actualmente" in dfl.columns:
-    dfl["labora_actualmente"] = (
-        dfl["labora_actualmente"].astype(str).str.upper().str.strip()
-    )
-    dfl = dfl[dfl["labora_actualmente"] == "S"]
+# 4️⃣ Empleo principal de cada persona (activo, con actividad_empresa y de
+# mayor ingreso); el Top 10 sale de los resúmenes por celda de los filtros
+if "actividad_empresa" not in ESQUEMAS["datalaboral"]:
+    st.error("No se encontró la columna 'actividad_empresa' en DataLaboral.")
+    st.stop()
 
-if dfl.empty:
+conteo, total_personas = top_k("actividad_empresa", selections, cedulas_validas, k=10)
+if total_personas == 0:
     st.warning("No hay registros laborales activos para las cédulas filtradas.")
     st.stop()
 
-# 5️⃣ Contar personas únicas por actividad económica
-dfl = dfl.dropna(subset=["actividad_empresa"]).copy()
-
-# Nos quedamos con el trabajo de mayor ingreso por persona
-dfl["ingreso_aproximado"] = pd.to_numeric(dfl["ingreso_aproximado"], errors="coerce")
-dfl = dfl.sort_values(
-    ["cedula", "ingreso_aproximado"],
-    ascending=[True, False],
-    kind="mergesort", 
-    na_position="last",
-).drop_duplicates(subset=["cedula"], keep="first")
-
-conteo = (
-    dfl.groupby("actividad_empresa")["cedula"]
-    .nunique()
-    .reset_index(name="total_personas")
-    .sort_values("total_personas", ascending=False)
+# 5️⃣ Personas únicas por actividad económica (una por persona), con los
+# empates del puesto 10
+conteo = conteo.rename(columns={"personas": "total_personas"}).sort_values(
+    "total_personas", ascending=False, kind="stable"
 )
 
 if conteo.empty:
@@ -1,11 +1,12 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_derived, get_table
 from utils.filtros import filtros_locales
+from utils.patronos import tabla_patronos
+from utils.topk import top_k
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 # Tema
@@ -15,13 +16,8 @@ aplicar_tema_plotly()
 st.title("🏢 Top 10 empleadores")
 
 # 2) Carga de datos
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_grad.columns = df_grad.columns.str.strip().str.lower()
-df_lab.columns = df_lab.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_grad = get_table("Graduados")
 
 # 3) Filtros base (una universidad)
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -29,87 +25,70 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
-# 4) Subconjunto laboral (solo cédulas filtradas)
-df_lab_ok = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-
-# Si existe labora_actualmente, filtrar a 'S'
-if "labora_actualmente" in df_lab_ok.columns:
-    df_lab_ok["labora_actualmente"] = (
-        df_lab_ok["labora_actualmente"].astype(str).str.upper().str.strip()
-    )
-    df_lab_ok = df_lab_ok[df_lab_ok["labora_actualmente"] == "S"]
+# 4) Columnas laborales (tabla compartida; solo se leen las filas necesarias)
+df_lab = get_table(
+    "DataLaboral",
+    columns=[
+        "cedula_id",
+        "nombre_patrono",
+        "patrono_id",
+        "nombre_patrono_canonico",
+        "tipo_patrono",
+    ],
+)
 
 # Validaciones mínimas
-if "nombre_patrono" not in df_lab_ok.columns:
-    st.error("No se encontró la columna 'nombre_patrono' en DataLaboral.")
+if "nombre_patrono_canonico" not in df_lab.columns:
+    st.error(
+        "No se encontró la columna 'nombre_patrono_canonico' en DataLaboral "
+        "(los nombres de patrono no se canonizaron al cargar)."
+    )
     st.stop()
-if "tipo_patrono" not in df_lab_ok.columns:
-    df_lab_ok["tipo_patrono"] = (
-        np.nan
-    )  # si no existe, la creamos vacía para evitar errores
-
-# 5) Limpieza de nombre de patrono
-df_lab_ok["nombre_patrono"] = df_lab_ok["nombre_patrono"].astype(str).str.strip()
-df_lab_ok = df_lab_ok.replace(
-    {"nombre_patrono": {"": np.nan, "SIN INFORMACION": np.nan, "NA": np.nan}}
+
+# 5) Un solo empleo por persona: el activo de mayor ingreso con nombre de
+# patrono (los vacíos o 'SIN INFORMACION' ya llegan como faltantes desde la
+# carga). Los empleadores se cuentan por su nombre canónico (las variantes
+# de un mismo nombre se unen al cargar, ver utils.patronos). El Top 10 sale
+# de los resúmenes por celda de los filtros, sin los patronos 'None', con el
+# tipo de patrono más frecuente de cada uno (en empate el primero)
+patronos = df_lab["nombre_patrono_canonico"].cat.categories
+top, total_personas = top_k(
+    "nombre_patrono_canonico",
+    selections,
+    cedulas_validas,
+    k=10,
+    subcolumna="tipo_patrono",
+    excluir=patronos[patronos.str.lower() == "none"],
 )
-df_lab_ok = df_lab_ok.dropna(subset=["nombre_patrono"])
 
-if df_lab_ok.empty:
+if total_personas == 0:
     st.warning(
         "No hay registros laborales con nombre de empleador para el filtro actual."
     )
     st.stop()
 
-# 6) Un solo empleo por persona: el de mayor ingreso
-df_lab_ok["ingreso_aproximado"] = pd.to_numeric(
-    df_lab_ok.get("ingreso_aproximado"), errors="coerce"
-)
-
-df_one_job = df_lab_ok.sort_values(
-    ["cedula", "ingreso_aproximado"],
-    ascending=[True, False],
-    kind="mergesort",  # mantiene el orden original en caso de empate
-    na_position="last",
-).drop_duplicates(subset=["cedula"], keep="first")
-
-
-# Conteo de empleados únicos por patrono (ya con un empleo por persona)
-conteo = (
-    df_one_job.groupby("nombre_patrono")["cedula"]
-    .nunique()
-    .reset_index(name="empleados_unicos")
-)
-
-# 7) Tipo de patrono (más frecuente por empleador) usando el dataset de un empleo
-tipo_pref = (
-    df_one_job.groupby(["nombre_patrono", "tipo_patrono"])["cedula"]
-    .count()
-    .rename("n")
-    .reset_index()
-    .sort_values(["nombre_patrono", "n"], ascending=[True, False])
-    .drop_duplicates(subset=["nombre_patrono"])[["nombre_patrono", "tipo_patrono"]]
+top = top.rename(
+    columns={
+        "nombre_patrono_canonico": "nombre_patrono",
+        "personas": "empleados_unicos",
+    }
 )
+if "tipo_patrono" not in top.columns:
+    # si no existe, la creamos vacía para evitar errores
+    top["tipo_patrono"] = np.nan
 
-
-top = conteo.merge(tipo_pref, on="nombre_patrono", how="left")
-
-# 8) Top 10 y % recalculado sobre el top (suma = 100 %)
-# Excluir patronos 'None' o vacíos
-top = top[top["nombre_patrono"].notna()]
-top = top[top["nombre_patrono"].str.lower() != "none"]
-
+# 6) Top 10 y % recalculado sobre el top (suma = 100 %)
 if top.empty:
     st.warning("No hay empleadores válidos después de limpiar los nombres.")
     st.stop()
 
 # Ordenar por empleados y seleccionar los 10 mayores
-top = top.sort_values("empleados_unicos", ascending=False).head(10)
+top = top.sort_values("empleados_unicos", ascending=False, kind="stable").head(10)
 
 # Recalcular % solo dentro del top 10
 total_top = top["empleados_unicos"].sum()
@@ -142,7 +121,9 @@ fig.update_traces(
     "Porcentaje: %{customdata[0]}%<br>"
     "Tipo de patrono: %{customdata[1]}<br>"
     "<extra></extra>",
-    customdata=np.stack([top["porcentaje"], top["tipo_patrono"].fillna("—")], axis=-1),
+    customdata=np.stack(
+        [top["porcentaje"], top["tipo_patrono"].astype(object).fillna("—")], axis=-1
+    ),
     textposition="outside",
 )
 
@@ -155,3 +136,18 @@ fig.update_layout(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+
+# 10) Nombres de empleador unificados al cargar (patrono_id guardado en la
+# carga), para revisarlos
+with st.expander("Nombres de empleador unificados"):
+    unidos = get_derived("patronos:tabla", lambda: tabla_patronos(df_lab))
+    if unidos.empty:
+        st.caption("Ningún nombre de empleador se unió a otro.")
+    else:
+        st.dataframe(
+            unidos.sort_values(["nombre_canonico", "filas"], ascending=[True, False])[
+                ["nombre_canonico", "nombre_patrono", "regla", "filas"]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
@@ -4,8 +4,9 @@ import pandas as pd
 import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
-from utils.filtros import filtros_locales
+from utils.datos import init_data, get_table
+from utils.filtros import ORDER, filtros_locales
+from utils.metricas import employment_rates
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 # Tema
@@ -15,13 +16,8 @@ aplicar_tema_plotly()
 st.title("📚 Inserción por nivel de grado")
 
 # 2) Carga de datos
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_grad.columns = df_grad.columns.str.strip().str.lower()
-df_lab.columns = df_lab.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_grad = get_table("Graduados")
 
 # 3) Filtros base (una universidad)
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -29,56 +25,22 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
 # 4) Columna de grado a usar
-if "grado" in df_grad_filtrado.columns:
-    col_grado = "grado"
-elif "cod_grado" in df_grad_filtrado.columns:
-    col_grado = "cod_grado"
-else:
-    st.error(
-        "No se encontró una columna de grado ('grado' o 'cod_grado') en Graduados."
-    )
+col_grado = "grado"
+if col_grado not in df_grad_filtrado.columns:
+    st.error("No se encontró la columna de grado ('grado') en Graduados.")
     st.stop()
 
-# 5) Denominador: graduados únicos por grado
-dfg = (
-    df_grad_filtrado[df_grad_filtrado["cedula"].isin(cedulas_validas)][
-        ["cedula", col_grado]
-    ]
-    .dropna(subset=[col_grado])
-    .copy()
-)
-
-denominador = (
-    dfg.groupby(col_grado)["cedula"].nunique().reset_index(name="total_graduados")
-)
-
-# 6) Numerador: empleados únicos por grado
-dfl = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-if "labora_actualmente" in dfl.columns:
-    dfl["labora_actualmente"] = (
-        dfl["labora_actualmente"].astype(str).str.upper().str.strip()
-    )
-    dfl = dfl[dfl["labora_actualmente"] == "S"]
-
-empleos = dfl.merge(dfg, on="cedula", how="inner")
-
-numerador = (
-    empleos.groupby(col_grado)["cedula"].nunique().reset_index(name="total_empleados")
-)
+# 5) Graduados y empleados (con trabajo actual) únicos por grado, desde el cubo
+filtros_cubo = {col: selections.get(label) for label, col in ORDER}
+res = employment_rates(filtros_cubo, by=[col_grado], empleo="activo")
 
-# 7) Combinar y calcular no empleados y % empleados (manual, sin barnorm)
-res = denominador.merge(numerador, on=col_grado, how="left").fillna(
-    {"total_empleados": 0}
-)
-res["total_no_empleados"] = (res["total_graduados"] - res["total_empleados"]).clip(
-    lower=0
-)
+# 6) % empleados y no empleados (manual, sin barnorm)
 res["pct_empleados"] = np.where(
     res["total_graduados"] > 0,
     (res["total_empleados"] / res["total_graduados"] * 100).round(1),
@@ -1,12 +1,11 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
-import numpy as np
-from pandas.tseries.offsets import DateOffset
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_table
+from utils.claves import a_cedulas
 from utils.filtros import filtros_locales
+from utils.tiempos import curvas_supervivencia, tiempo_primer_empleo
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
 # === Tema ===
@@ -16,13 +15,8 @@ aplicar_tema_plotly()
 st.title("⏱️ Tiempo al primer empleo")
 
 # === 2) Carga de datos ===
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_grad.columns = df_grad.columns.str.strip().str.lower()
-df_lab.columns = df_lab.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_grad = get_table("Graduados")
 
 # === 3) Filtros base (una universidad) ===
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -30,133 +24,163 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-# --- Cohorte fija: 2024 ---
-df_grad_filtrado = df_grad_filtrado[
-    df_grad_filtrado["anio_graduacion"].astype(str) == "2024"
-].copy()
-if df_grad_filtrado.empty:
-    st.warning(
-        "No hay graduados en el Año de Graduacion 2024 con los filtros seleccionados."
-    )
-    st.stop()
-
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
-# Mantener solo cédulas válidas de la cohorte 2024
-cedulas_2024 = set(
-    df_grad_filtrado[df_grad_filtrado["cedula"].isin(cedulas_validas)]["cedula"]
-    .dropna()
-    .astype(str)
-    .unique()
-    .tolist()
+# === 4) Vista: distribución de quienes consiguieron empleo o curva de supervivencia ===
+vista = st.radio(
+    "Vista",
+    options=["Distribución", "Curva de supervivencia"],
+    index=0,
+    horizontal=True,
 )
-if not cedulas_2024:
-    st.warning(
-        "No hay cédulas válidas en el Año de Graduacion 2024 para calcular el tiempo al primer empleo."
-    )
-    st.stop()
 
-# === 4) Fechas fijas del ejercicio ===
-FECHA_GRAD_FIJA = pd.Timestamp("2024-03-01")  # todas las personas
-FECHA_SNAPSHOT = pd.Timestamp("2025-04-01")  # fecha de extracción de DataLaboral
-
-# === 5) Subconjunto laboral: solo esas cédulas y empleo vigente (si existe el campo) ===
-dfl = df_lab[df_lab["cedula"].isin(cedulas_2024)].copy()
-if dfl.empty:
-    st.warning(
-        "No hay registros laborales para las cédulas del Año de Graduacion 2024."
+if vista == "Curva de supervivencia":
+    # Kaplan-Meier: quien aún no tiene empleo cuenta como censurado
+    # (no se descarta), ver curvas_supervivencia en utils/tiempos.py
+    GRUPOS = {
+        "Sin agrupar": None,
+        "Año de Graduación": "anio_graduacion",
+        "Nivel": "grado",
+        "Facultad": "facultad",
+        "Carrera": "carrera",
+    }
+    MAX_GRUPOS = 10  # curvas a dibujar (los grupos más grandes)
+
+    col_por, col_horizonte = st.columns(2)
+    with col_por:
+        etiqueta_por = st.selectbox("Agrupar por", options=list(GRUPOS), index=2)
+    with col_horizonte:
+        horizonte = st.slider("Meses desde la graduación", 6, 120, 24, step=6)
+
+    por = GRUPOS[etiqueta_por]
+    if por is not None and por not in df_grad_filtrado.columns:
+        st.error(f"No se encontró la columna '{por}' en Graduados.")
+        st.stop()
+
+    curvas = curvas_supervivencia(df_grad_filtrado, por=por, horizonte=horizonte)
+    if curvas is None:
+        st.error(
+            "No se encontró la columna 'antiguedad_meses' en DataLaboral. No es posible estimar la fecha de inicio."
+        )
+        st.stop()
+    if curvas.empty or curvas["personas"].max() == 0:
+        st.warning("No hay graduados con fecha de graduación anterior al corte.")
+        st.stop()
+
+    col_grupo = por or "grupo"
+    tamanos = curvas.drop_duplicates(subset=[col_grupo]).set_index(col_grupo)[
+        "personas"
+    ]
+    principales = tamanos[tamanos > 0].nlargest(MAX_GRUPOS, keep="first").index
+    curvas = curvas[curvas[col_grupo].isin(principales)]
+    if len(tamanos) > MAX_GRUPOS:
+        st.caption(f"Se muestran los {MAX_GRUPOS} grupos con más graduados.")
+
+    fig_km = px.line(
+        curvas,
+        x="mes",
+        y="pct_empleados",
+        color=col_grupo,
+        line_shape="hv",
+        custom_data=["en_riesgo", "eventos", "censurados"],
+        labels={
+            "mes": "Meses desde la graduación",
+            "pct_empleados": "% con empleo",
+            col_grupo: etiqueta_por,
+        },
+        title="Tiempo al primer empleo (Kaplan-Meier, sin empleo = censurado)",
     )
-    st.stop()
-
-if "labora_actualmente" in dfl.columns:
-    dfl["labora_actualmente"] = (
-        dfl["labora_actualmente"].astype(str).str.upper().str.strip()
+    fig_km.update_traces(
+        hovertemplate="<b>%{fullData.name}</b><br>"
+        "Mes: %{x}<br>"
+        "Con empleo: %{y:.1f}%<br>"
+        "En riesgo: %{customdata[0]}<br>"
+        "Empleados en el mes: %{customdata[1]}<br>"
+        "Censurados en el mes: %{customdata[2]}<extra></extra>"
     )
-    dfl = dfl[dfl["labora_actualmente"] == "S"]
+    fig_km.update_layout(
+        yaxis=dict(range=[0, 100]),
+        height=500,
+        margin=dict(l=10, r=10, t=60, b=10),
+    )
+    st.plotly_chart(fig_km, use_container_width=True)
 
-if dfl.empty:
-    st.warning("No hay empleos vigentes para las cédulas del Año de Graduacion 2024.")
+    resumen = curvas[curvas["mes"] == horizonte][[col_grupo, "personas"]].assign(
+        pct_empleados=curvas.loc[curvas["mes"] == horizonte, "pct_empleados"].round(1)
+    )
+    st.dataframe(
+        resumen.rename(
+            columns={
+                col_grupo: etiqueta_por,
+                "personas": "Graduados",
+                "pct_empleados": f"% con empleo al mes {horizonte}",
+            }
+        ).reset_index(drop=True)
+    )
     st.stop()
 
-# Requerimos antiguedad_meses para estimar fecha de inicio del empleo
-if "antiguedad_meses" not in dfl.columns:
+# === 5) Meses al primer empleo de todas las cohortes a la vez ===
+# Fecha de graduación por cohorte y fecha de extracción: ver utils/tiempos.py
+MAX_MESES = 24  # quitar outliers imposibles (por ejemplo, máx 2 años)
+
+tiempos = tiempo_primer_empleo(df_grad_filtrado)
+if tiempos is None:
     st.error(
         "No se encontró la columna 'antiguedad_meses' en DataLaboral. No es posible estimar la fecha de inicio."
     )
     st.stop()
 
-# Limpiar y calcular fecha de inicio estimada
-dfl = dfl.copy()
-dfl["antiguedad_meses"] = pd.to_numeric(dfl["antiguedad_meses"], errors="coerce")
-dfl = dfl.dropna(subset=["antiguedad_meses"])
-dfl["antiguedad_meses"] = dfl["antiguedad_meses"].astype(int).clip(lower=0)
-
-# fecha_inicio_empleo = FECHA_SNAPSHOT - antiguedad_meses
-dfl["fecha_inicio_empleo"] = FECHA_SNAPSHOT - dfl["antiguedad_meses"].apply(
-    lambda m: DateOffset(months=int(m))
-)
-
-# Mantener solo empleos que comienzan en/tras la graduación (excluir empleos previos a graduación)
-dfl = dfl[dfl["fecha_inicio_empleo"] >= FECHA_GRAD_FIJA].copy()
-if dfl.empty:
+# Solo empleos que comienzan en/tras la graduación, sin outliers
+primer_empleo = tiempos[tiempos["meses_al_primer_empleo"] <= MAX_MESES]
+if primer_empleo.empty:
     st.warning(
-        "Todos los empleos comienzan antes de la fecha de graduación fija (2024-03-01). No hay datos para mostrar."
+        "No hay empleos que comiencen después de la graduación con los filtros seleccionados."
     )
     st.stop()
 
-# Para cédulas con múltiples empleos post-graduacion, tomar el más antiguo; si hay empate:
-# 1) el de mayor ingreso, y si persiste,
-# 2) el primero que aparece en el dataset original.
-
-# Asegurar ingreso numérico
-dfl["ingreso_aproximado"] = pd.to_numeric(
-    dfl.get("ingreso_aproximado"), errors="coerce"
+# === 6) Comparación entre cohortes ===
+por_cohorte = (
+    primer_empleo.groupby("anio_graduacion", observed=True)["meses_al_primer_empleo"]
+    .agg(personas="size", mediana="median", promedio="mean")
+    .reset_index()
 )
-
-# Guardar el orden original (para desempate final)
-dfl = dfl.reset_index(drop=False).rename(columns={"index": "orden_original"})
-
-primer_empleo = (
-    dfl.sort_values(
-        ["fecha_inicio_empleo", "ingreso_aproximado", "orden_original"],
-        ascending=[True, False, True],
-        na_position="last",
-    )
-    .groupby("cedula", as_index=False)
-    .first()[["cedula", "fecha_inicio_empleo"]]
+por_cohorte["promedio"] = por_cohorte["promedio"].round(1)
+
+fig_cohortes = px.bar(
+    por_cohorte,
+    x="anio_graduacion",
+    y="mediana",
+    text="mediana",
+    custom_data=["personas", "promedio"],
+    labels={
+        "anio_graduacion": "Año de Graduación",
+        "mediana": "Mediana (meses)",
+    },
+    title="Meses al primer empleo por Año de Graduación (mediana)",
 )
-
-
-# Calcular meses desde la graduación al primer empleo
-# Diferencia en meses calendario: (año*12 + mes) + ajuste por días
-def diff_meses(d_ini: pd.Timestamp, d_fin: pd.Timestamp) -> float:
-    # meses completos entre fechas, con ajuste parcial según día
-    months = (d_fin.year - d_ini.year) * 12 + (d_fin.month - d_ini.month)
-    # ajustar por día del mes (si el día de fin es anterior al día de inicio, restar un mes)
-    if d_fin.day < d_ini.day:
-        months -= 1
-    return float(months)
-
-
-primer_empleo["meses_al_primer_empleo"] = (
-    primer_empleo["fecha_inicio_empleo"]
-    .apply(lambda d: diff_meses(FECHA_GRAD_FIJA, d))
-    .clip(lower=0)
+fig_cohortes.update_traces(
+    texttemplate="%{text:.1f}",
+    hovertemplate="<b>%{x}</b><br>"
+    "Mediana: %{y:.1f} meses<br>"
+    "Promedio: %{customdata[1]} meses<br>"
+    "Personas: %{customdata[0]}<extra></extra>",
 )
+fig_cohortes.update_layout(
+    xaxis=dict(type="category"),
+    height=400,
+    margin=dict(l=10, r=10, t=60, b=10),
+)
+st.plotly_chart(fig_cohortes, use_container_width=True)
 
-# Quitar outliers imposibles (por si hay datos corruptos)
-primer_empleo = primer_empleo[
-    primer_empleo["meses_al_primer_empleo"] <= 24
-]  # por ejemplo, máx 2 años
-if primer_empleo.empty:
-    st.warning("No quedaron registros válidos tras limpiar outliers.")
-    st.stop()
+# === 7) Detalle de una cohorte ===
+cohortes = por_cohorte["anio_graduacion"].astype(str).tolist()
+cohorte = st.selectbox("Año de Graduación", options=cohortes, index=len(cohortes) - 1)
+primer_empleo = primer_empleo[primer_empleo["anio_graduacion"].astype(str) == cohorte]
 
-# === 6) KPIs básicos ===
-n_personas = primer_empleo["cedula"].nunique()
+n_personas = primer_empleo["cedula_id"].nunique()
 mediana_meses = float(primer_empleo["meses_al_primer_empleo"].median())
 promedio_meses = round(float(primer_empleo["meses_al_primer_empleo"].mean()), 1)
 
@@ -165,13 +189,13 @@ c1.metric("Personas con empleo post-graduación", f"{n_personas}")
 c2.metric("Mediana (meses)", f"{mediana_meses:.1f}")
 c3.metric("Promedio (meses)", f"{promedio_meses:.1f}")
 
-# === 7) Histograma / distribución ===
+# === 8) Histograma / distribución ===
 fig = px.histogram(
     primer_empleo,
     x="meses_al_primer_empleo",
     nbins=12,
     labels={"meses_al_primer_empleo": "Meses al primer empleo"},
-    title="Distribución: meses al primer empleo (Año de Graduacion 2024)",
+    title=f"Distribución: meses al primer empleo (Año de Graduacion {cohorte})",
 )
 fig.update_traces(hovertemplate="Meses: %{x}<br>Personas: %{y}<extra></extra>")
 fig.update_layout(
@@ -181,8 +205,13 @@ fig.update_layout(
 )
 st.plotly_chart(fig, use_container_width=True)
 
-# === 8) Tabla resumida opcional (por si deseas revisar) ===
+# === 9) Tabla resumida opcional (por si deseas revisar) ===
 with st.expander("Ver tabla (cedula, fecha_inicio_empleo, meses)"):
+    tabla = primer_empleo.assign(cedula=a_cedulas(primer_empleo["cedula_id"]))[
+        ["cedula", "fecha_inicio_empleo", "meses_al_primer_empleo"]
+    ]
     st.dataframe(
-        primer_empleo.sort_values("meses_al_primer_empleo").reset_index(drop=True)
+        tabla.sort_values("meses_al_primer_empleo", kind="mergesort").reset_index(
+            drop=True
+        )
     )
@@ -1,10 +1,10 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-import numpy as np
 
 # Utilidades del proyecto
-from utils.datos import init_data, get_data_copy
+from utils.datos import init_data, get_table
+from utils import bitmaps
 from utils.filtros import filtros_locales
 from utils.estilos import aplicar_tema_plotly, mostrar_tarjeta_nota
 
@@ -15,13 +15,8 @@ aplicar_tema_plotly()
 st.title("👥 Tasa de Multiempleo")
 
 # 2️⃣ Cargar datos
-init_data()
-df_grad = get_data_copy("Graduados")
-df_lab = get_data_copy("DataLaboral")
-
-# Normalizar columnas
-df_grad.columns = df_grad.columns.str.strip().str.lower()
-df_lab.columns = df_lab.columns.str.strip().str.lower()
+init_data(["Graduados", "DataLaboral"])
+df_grad = get_table("Graduados")
 
 # 3️⃣ Filtros
 df_grad_filtrado, cedulas_filtradas, selections = filtros_locales(df_grad)
@@ -30,37 +25,31 @@ if df_grad_filtrado.empty:
     st.warning("No hay datos disponibles con los filtros seleccionados.")
     st.stop()
 
-cedulas_validas = set(cedulas_filtradas)
-if not cedulas_validas:
+cedulas_validas = cedulas_filtradas
+if cedulas_validas.size == 0:
     st.warning("No hay cédulas válidas tras aplicar los filtros.")
     st.stop()
 
-# 4️⃣ Filtrar data laboral solo a esas cédulas
-df_lab_filtrado = df_lab[df_lab["cedula"].isin(cedulas_validas)].copy()
-
-# Considerar solo empleados activos si existe el campo
-if "labora_actualmente" in df_lab_filtrado.columns:
-    df_lab_filtrado["labora_actualmente"] = (
-        df_lab_filtrado["labora_actualmente"].astype(str).str.upper().str.strip()
-    )
-    df_lab_filtrado = df_lab_filtrado[df_lab_filtrado["labora_actualmente"] == "S"]
+# 4️⃣ Personas filtradas con empleo activo (mapas de bits por cedula_id)
+mapas_lab = bitmaps.laboral()
+filtradas = bitmaps.desde_ids(cedulas_validas)
+n_activos = int(bitmaps.contar(bitmaps.y(filtradas, mapas_lab["activo"])))
 
-if df_lab_filtrado.empty:
+if n_activos == 0:
     st.warning("No hay registros laborales para calcular multiempleo.")
     st.stop()
 
-# 5️⃣ Contar registros laborales por persona
-conteo = df_lab_filtrado.groupby("cedula").size().reset_index(name="num_empleos")
-
-# Clasificar en multiempleado o no
-conteo["multiempleo"] = np.where(
-    conteo["num_empleos"] > 1, "Sí (más de 1 empleo)", "No (1 empleo)"
-)
+# 5️⃣ Multiempleo = más de un registro laboral activo
+n_multi = int(bitmaps.contar(bitmaps.y(filtradas, mapas_lab["multiempleo"])))
 
 # 6️⃣ Calcular totales y porcentaje
-resumen = (
-    conteo.groupby("multiempleo")["cedula"].count().reset_index(name="total_personas")
+resumen = pd.DataFrame(
+    {
+        "multiempleo": ["No (1 empleo)", "Sí (más de 1 empleo)"],
+        "total_personas": [n_activos - n_multi, n_multi],
+    }
 )
+resumen = resumen[resumen["total_personas"] > 0].reset_index(drop=True)
 
 total = resumen["total_personas"].sum()
 resumen["porcentaje"] = (resumen["total_personas"] / total * 100).round(1)
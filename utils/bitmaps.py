@@ -0,0 +1,267 @@
+# utils/bitmaps.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from utils import claves
+from utils.datos import get_derived, get_table
+
+# Mapas de bits sobre la dimensión persona: el bit i corresponde a cedula_id i.
+# Cada mapa es un arreglo uint8 empaquetado con np.packbits, así que un
+# conjunto de 100k personas ocupa ~12 KB y intersecar + contar es un AND y un
+# popcount sobre esos bytes. Los mapas se construyen una vez por versión de
+# datos (get_derived). Como el diccionario de cédulas solo crece, un mapa
+# construido antes puede ser más corto: los bits que le faltan valen 0.
+#
+# Los filtros de Graduados son por fila: quien tiene dos títulos cumple
+# "universidad U y carrera C" solo si uno de ellos tiene las dos. Para las
+# personas con una sola fila eso es un AND de mapas; las filas de quienes
+# tienen varias (pocas) se guardan aparte y se cuentan directamente.
+
+# Dimensiones de Graduados con un mapa por valor
+DIMENSIONES = [
+    "universidad",
+    "grado",
+    "facultad",
+    "carrera",
+    "enfasis",
+    "anio_graduacion",
+    "cod_graduacion",
+]
+
+
+def desde_ids(ids, n=None):
+    """Mapa con los cedula_id dados encendidos."""
+    n = claves.total() if n is None else n
+    ids = np.asarray(ids, dtype=np.int64)
+    mascara = np.zeros(n, dtype=bool)
+    mascara[ids[(ids >= 0) & (ids < n)]] = True
+    return np.packbits(mascara)
+
+
+def y(*mapas):
+    """AND de varios mapas (o de un mapa con una matriz de mapas, por filas)."""
+    largo = min(m.shape[-1] for m in mapas)
+    resultado = mapas[0][..., :largo]
+    for m in mapas[1:]:
+        resultado = resultado & m[..., :largo]
+    return resultado
+
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:  # numpy < 2.0: tabla de bits encendidos por byte
+    _BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+        axis=1, dtype=np.uint8
+    )
+    _popcount = _BITS_POR_BYTE.__getitem__
+
+
+def contar(mapa):
+    """Personas en un mapa (popcount); por fila si es una matriz de mapas."""
+    return _popcount(mapa).sum(axis=-1, dtype=np.int64)
+
+
+def _por_valor(ids, codigos, k, n):
+    """Matriz k x bytes: fila j = personas con alguna fila de código j."""
+    mapas = np.zeros((k, (n + 7) // 8), dtype=np.uint8)
+    validos = (ids >= 0) & (codigos >= 0)
+    ids, codigos = ids[validos], codigos[validos]
+    orden = np.argsort(codigos, kind="stable")
+    limites = np.searchsorted(codigos[orden], np.arange(k + 1))
+    mascara = np.zeros(n, dtype=bool)
+    for j in range(k):
+        personas = ids[orden[limites[j] : limites[j + 1]]]
+        if len(personas):
+            mascara[personas] = True
+            mapas[j] = np.packbits(mascara)
+            mascara[personas] = False
+    return mapas
+
+
+def contiene(mapa, ids):
+    """Bit de cada cedula_id en el mapa (False si el mapa es más corto)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    dentro = ids < len(mapa) * 8
+    bits = np.zeros(len(ids), dtype=bool)
+    i = ids[dentro]
+    bits[dentro] = (mapa[i >> 3] >> (7 - (i & 7))) & 1
+    return bits
+
+
+def _codificar(col):
+    """Valores distintos ordenados (texto) y código de cada fila (-1 si falta)."""
+    texto = col.astype(str).where(col.notna())
+    valores = sorted(texto.dropna().unique().tolist())
+    codigos = np.full(len(col), -1, dtype=np.int64)
+    presentes = texto.notna().to_numpy()
+    codigos[presentes] = np.searchsorted(valores, texto[presentes].to_numpy())
+    return valores, codigos
+
+
+def _dimension(col, ids, n):
+    valores, codigos = _codificar(col)
+    return {"valores": valores, "mapas": _por_valor(ids, codigos, len(valores), n)}
+
+
+def _construir_graduados():
+    df = get_table("Graduados", columns=[claves.COL_ID] + DIMENSIONES)
+    n = claves.total()
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    validas = ids >= 0
+    filas_por_persona = np.bincount(ids[validas], minlength=n)
+    varias = validas.copy()
+    varias[validas] = filas_por_persona[ids[validas]] > 1
+
+    dims, codigos_varias = {}, {}
+    for col in DIMENSIONES:
+        if col not in df.columns:
+            continue
+        valores, codigos = _codificar(df[col])
+        dims[col] = {
+            "valores": valores,
+            "codigo_de": {v: i for i, v in enumerate(valores)},
+            "mapas": _por_valor(ids, codigos, len(valores), n),
+        }
+        codigos_varias[col] = codigos[varias]
+    return {
+        "dims": dims,
+        "unica": desde_ids(np.flatnonzero(filas_por_persona == 1), n),
+        "varias": {"ids": ids[varias], "codigos": codigos_varias},
+    }
+
+
+def _construir_laboral():
+    df = get_table("DataLaboral", columns=[claves.COL_ID, "labora_actualmente"])
+    n = claves.total()
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    if "labora_actualmente" in df.columns:
+        activos = ids[df["labora_actualmente"].to_numpy(dtype=bool)]
+    else:
+        activos = ids
+    ids_activos, empleos = np.unique(activos[activos >= 0], return_counts=True)
+    return {
+        "empleado": desde_ids(ids, n),
+        "activo": desde_ids(ids_activos, n),
+        "multiempleo": desde_ids(ids_activos[empleos > 1], n),
+    }
+
+
+def _construir_provincia():
+    df = get_table("DataLocalizacion", columns=[claves.COL_ID, "provincia_norm"])
+    if "provincia_norm" not in df.columns:
+        return None
+    n = claves.total()
+    # Una provincia por persona: la primera registrada
+    df = df.dropna(subset=["provincia_norm"]).drop_duplicates(subset=[claves.COL_ID])
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    return _dimension(df["provincia_norm"], ids, n)
+
+
+def graduados():
+    """
+    Mapas de Graduados:
+      - dims: {dimensión: {"valores", "codigo_de", "mapas"}}, un mapa por valor
+      - unica: personas con una sola fila en Graduados
+      - varias: cedula_id y códigos por dimensión de las filas de las demás
+    """
+    return get_derived("bitmaps:graduados", _construir_graduados)
+
+
+def laboral():
+    """
+    Mapas de DataLaboral:
+      - empleado: tiene algún registro laboral
+      - activo: tiene algún registro con labora_actualmente
+      - multiempleo: tiene más de un registro activo
+    """
+    return get_derived("bitmaps:laboral", _construir_laboral)
+
+
+def provincia():
+    """
+    {"valores": [...], "mapas": matriz} con la provincia de cada persona
+    (None si DataLocalizacion no tiene provincia).
+    """
+    return get_derived("bitmaps:provincia", _construir_provincia)
+
+
+def conteo_por_valor(dimension, *filtros):
+    """
+    Personas por valor de una dimensión dentro de la intersección de los
+    filtros. Devuelve (valores, conteos) solo con los valores presentes.
+    """
+    conteos = contar(y(dimension["mapas"], *filtros))
+    presentes = np.flatnonzero(conteos)
+    return [dimension["valores"][i] for i in presentes], conteos[presentes]
+
+
+def conteo_graduados(filtros_sel=None, por=None, marcas=None):
+    """
+    Graduados que cumplen los filtros (con alguna fila que tenga todos los
+    valores, como al filtrar las filas de Graduados), por valor de `por`, y
+    cuántos de ellos están en cada mapa de `marcas`.
+
+    Parameters:
+    -----------
+    filtros_sel : dict, optional
+        {dimensión: valor}; 'Todos' o None no filtran
+    por : str, optional
+        Dimensión por la que agrupar (default: sin agrupar)
+    marcas : dict, optional
+        {nombre: mapa}, p. ej. {"empleados": laboral()["empleado"]}
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Una fila por valor de `por` con personas (sin agrupar: una sola
+        fila), en el orden de los valores, con la columna personas y una
+        columna por marca
+    """
+    datos = graduados()
+    dims, varias = datos["dims"], datos["varias"]
+    marcas = marcas or {}
+
+    # Personas con una fila: AND de mapas; con varias: sus filas que cumplen
+    seleccion = datos["unica"]
+    filas = np.ones(len(varias["ids"]), dtype=bool)
+    for col, valor in (filtros_sel or {}).items():
+        if valor is None or valor == "Todos":
+            continue
+        codigo = dims[col]["codigo_de"].get(str(valor))
+        if codigo is None:
+            seleccion = np.zeros_like(seleccion)
+            filas[:] = False
+            continue
+        seleccion = y(seleccion, dims[col]["mapas"][codigo])
+        filas &= varias["codigos"][col] == codigo
+
+    if por is None:
+        personas = np.unique(varias["ids"][filas])
+        res = pd.DataFrame({"personas": [int(contar(seleccion)) + len(personas)]})
+        for nombre, mapa in marcas.items():
+            extra = int(contiene(mapa, personas).sum())
+            res[nombre] = int(contar(y(seleccion, mapa))) + extra
+        return res
+
+    k = len(dims[por]["valores"])
+    con_valor = y(dims[por]["mapas"], seleccion)
+    codigos = varias["codigos"][por][filas]
+    ids = varias["ids"][filas][codigos >= 0]
+    n = int(ids.max()) + 1 if len(ids) else 1
+    pares = np.unique(codigos[codigos >= 0] * n + ids)
+    codigo, personas = pares // n, pares % n
+
+    totales = contar(con_valor) + np.bincount(codigo, minlength=k)
+    presentes = np.flatnonzero(totales)
+    res = pd.DataFrame(
+        {
+            por: np.asarray(dims[por]["valores"], dtype=object)[presentes],
+            "personas": totales[presentes],
+        }
+    )
+    for nombre, mapa in marcas.items():
+        extra = np.bincount(codigo, weights=contiene(mapa, personas), minlength=k)
+        conteos = contar(y(con_valor, mapa)) + extra.astype(np.int64)
+        res[nombre] = conteos[presentes]
+    return res
@@ -0,0 +1,127 @@
+# utils/cache.py
+from __future__ import annotations
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.datos import get_data_version
+from utils.filtros import ORDER
+
+# Caché de resultados de las páginas, compartida por todas las sesiones.
+#
+# st.cache_data hashea todos los argumentos (DataFrames completos incluidos)
+# en cada rerun solo para buscar la entrada. Aquí la clave es
+# (versión de datos, selección de los filtros, métrica): la selección ya
+# determina qué filas recibe el cálculo, así que los DataFrames no se miran.
+# Un acierto cuesta buscar una tupla en un dict.
+#
+# Las entradas caducan a los TTL_SEGUNDOS y, pasado MAX_ENTRADAS, se descarta
+# la usada hace más tiempo (LRU). Al recargar los datos cambia la versión y
+# las entradas anteriores se descartan.
+MAX_ENTRADAS = 512
+TTL_SEGUNDOS = 3600
+
+_CACHE = OrderedDict()  # clave -> (instante de cálculo, resultado)
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "expiradas": 0}
+
+
+def clave_seleccion(selections):
+    """Tupla hashable con los valores de los filtros, en el orden de ORDER."""
+    return tuple(selections.get(label) for label, _ in ORDER)
+
+
+def _buscar(clave):
+    with _LOCK:
+        entrada = _CACHE.get(clave)
+        if entrada is not None:
+            if time.monotonic() - entrada[0] <= TTL_SEGUNDOS:
+                _CACHE.move_to_end(clave)
+                _STATS["hits"] += 1
+                return entrada
+            del _CACHE[clave]
+            _STATS["expiradas"] += 1
+        _STATS["misses"] += 1
+        return None
+
+
+def _guardar(clave, resultado):
+    with _LOCK:
+        if _CACHE:
+            version = next(iter(_CACHE))[0]
+            # Calculado con datos ya recargados: no se guarda
+            if clave[0] < version:
+                return
+            # Las entradas de versiones anteriores ya no sirven
+            if clave[0] > version:
+                _CACHE.clear()
+        _CACHE[clave] = (time.monotonic(), resultado)
+        _CACHE.move_to_end(clave)
+        while len(_CACHE) > MAX_ENTRADAS:
+            _CACHE.popitem(last=False)
+
+
+def _entregar(resultado):
+    # Copia superficial: con copy-on-write la página puede modificar su
+    # DataFrame sin tocar el guardado
+    if isinstance(resultado, (pd.DataFrame, pd.Series)):
+        return resultado.copy(deep=False)
+    return resultado
+
+
+def cache_por_seleccion(metrica=None):
+    """
+    Decorador: guarda el resultado de la función con clave
+    (versión de datos, seleccion, metrica).
+
+    La función decorada recibe como primer argumento `seleccion`, una tupla
+    hashable (ver clave_seleccion). El resto de argumentos NO forman parte de
+    la clave: deben quedar determinados por la selección y la versión de los
+    datos (por ejemplo, las filas que devuelve filtros_locales).
+
+    Parameters:
+    -----------
+    metrica : str, optional
+        Nombre de la métrica en la clave (default: nombre de la función)
+    """
+
+    def decorador(funcion):
+        nombre = metrica or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(seleccion, *args, **kwargs):
+            clave = (get_data_version(), tuple(seleccion), nombre)
+            entrada = _buscar(clave)
+            if entrada is not None:
+                return _entregar(entrada[1])
+            resultado = funcion(seleccion, *args, **kwargs)
+            _guardar(clave, resultado)
+            return _entregar(resultado)
+
+        return envoltura
+
+    return decorador
+
+
+def limpiar():
+    """Descarta todas las entradas."""
+    with _LOCK:
+        _CACHE.clear()
+
+
+def estadisticas():
+    """Aciertos, fallos, expiradas y tamaño de la caché de resultados."""
+    with _LOCK:
+        consultas = _STATS["hits"] + _STATS["misses"]
+        return {
+            "hits": _STATS["hits"],
+            "misses": _STATS["misses"],
+            "expiradas": _STATS["expiradas"],
+            "tasa_aciertos": _STATS["hits"] / consultas if consultas else 0.0,
+            "entradas": len(_CACHE),
+            "max_entradas": MAX_ENTRADAS,
+            "ttl_segundos": TTL_SEGUNDOS,
+        }
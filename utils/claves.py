@@ -0,0 +1,89 @@
+# utils/claves.py
+from __future__ import annotations
+import threading
+import numpy as np
+import pandas as pd
+
+# Diccionario único de cédulas para todo el proceso.
+# Cada cédula recibe un código entero denso (0..N-1) en orden de aparición; los
+# códigos nunca cambian mientras el diccionario vive, así que todas las tablas
+# comparten la misma clave `cedula_id` y los arreglos por persona pueden
+# indexarse directamente con ella.
+_DICCIONARIO = {"cedulas": pd.Index([], dtype=object)}
+_LOCK = threading.Lock()
+
+COL_ID = "cedula_id"
+
+
+def reiniciar():
+    """Vacía el diccionario (al recargar todas las tablas)."""
+    with _LOCK:
+        _DICCIONARIO["cedulas"] = pd.Index([], dtype=object)
+
+
+def registrar(cedulas):
+    """
+    Agrega al diccionario las cédulas nuevas de la serie y la devuelve como
+    categórica con las categorías del diccionario (códigos = cedula_id).
+    """
+    cat = cedulas if isinstance(cedulas.dtype, pd.CategoricalDtype) else None
+    if cat is None:
+        cat = cedulas.astype(str).astype("category")
+
+    with _LOCK:
+        actuales = _DICCIONARIO["cedulas"]
+        nuevas = cat.cat.categories.difference(actuales, sort=False)
+        if len(nuevas):
+            actuales = actuales.append(pd.Index(nuevas, dtype=object))
+            _DICCIONARIO["cedulas"] = actuales
+
+    if cat.cat.categories.equals(actuales):
+        return cat
+    return cat.cat.set_categories(actuales)
+
+
+def alinear(cedulas):
+    """
+    Re-expresa una cédula ya registrada con las categorías actuales del
+    diccionario (que solo crece al final, así que los códigos no cambian).
+    """
+    actuales = _DICCIONARIO["cedulas"]
+    if cedulas.cat.categories.equals(actuales):
+        return cedulas
+    return cedulas.cat.set_categories(actuales)
+
+
+def codigos(cedulas):
+    """Códigos int32 (cedula_id) de una cédula categórica ya registrada."""
+    return cedulas.cat.codes.astype("int32")
+
+
+def a_ids(valores):
+    """
+    Convierte cédulas en texto a cedula_id; las desconocidas quedan en -1.
+    """
+    valores = pd.Index([str(v) for v in valores], dtype=object)
+    return _DICCIONARIO["cedulas"].get_indexer(valores).astype("int32")
+
+
+def a_cedulas(ids):
+    """Cédulas en texto para un arreglo de cedula_id."""
+    return _DICCIONARIO["cedulas"].take(np.asarray(ids, dtype=np.int64))
+
+
+def total():
+    """Cantidad de cédulas registradas (tamaño de los arreglos por persona)."""
+    return len(_DICCIONARIO["cedulas"])
+
+
+def indice_filas(ids):
+    """
+    Índice cedula_id -> filas de una tabla: las filas ordenadas por cédula
+    (`orden`) y dónde empieza cada cédula en ese orden (`inicios`).
+    """
+    ids = np.asarray(ids)
+    conteos = np.bincount(ids[ids >= 0], minlength=total())
+    orden = np.argsort(ids, kind="stable")[len(ids) - int(conteos.sum()) :]
+    inicios = np.zeros(len(conteos) + 1, dtype=np.int64)
+    np.cumsum(conteos, out=inicios[1:])
+    return {"orden": orden, "inicios": inicios}
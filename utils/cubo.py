@@ -0,0 +1,175 @@
+# utils/cubo.py
+from __future__ import annotations
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+
+from utils import claves, filtros, hechos
+from utils.datos import get_derived, get_table
+
+# Cubo de conteos de empleo sobre las dimensiones de los filtros + provincia.
+#
+# Los conteos son de personas distintas, que no se pueden sumar al agregar
+# (una persona con dos carreras contaría doble). Por eso el cubo se guarda como
+# "grouping sets": para cada combinación de dimensiones, personas distintas por
+# celda. Filtrar por F y agrupar por G equivale a leer el grouping set F ∪ G y
+# quedarse con las celdas de los valores filtrados, sin tocar las filas crudas.
+#
+# Los grouping sets de una y dos dimensiones se calculan junto con el cubo; el
+# resto se calcula la primera vez que se consulta y queda guardado hasta la
+# siguiente recarga de datos.
+
+DIMENSIONES = [col for _, col in filtros.ORDER] + ["provincia_norm"]
+
+# Protege los grouping sets que se agregan al cubo compartido al consultarlos
+_CONJUNTOS_LOCK = threading.Lock()
+
+# Medidas por celda (personas distintas)
+MEDIDAS = {
+    "total_graduados": None,
+    "total_empleados": "empleado",  # algún registro en DataLaboral
+    "total_activos": "activo",  # algún registro con labora_actualmente
+}
+
+
+def _construir_base():
+    """Códigos por fila de Graduados (dimensiones) y banderas por persona."""
+    df = get_table("Graduados")
+    indice, _ = filtros.obtener_indice(df)
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+
+    dims = {
+        col: {"valores": d["valores"], "codigos": d["codigos"].astype(np.int64)}
+        for col, d in indice["dims"].items()
+    }
+
+    # Hechos de todas las personas, indexados por cedula_id
+    personas = hechos.personas(["empleado", "activo", "provincia_norm"])
+    provincia = personas["provincia_norm"]
+    codigos_prov = provincia.cat.codes.to_numpy(dtype=np.int64)
+    dims["provincia_norm"] = {
+        "valores": [str(v) for v in provincia.cat.categories],
+        "codigos": np.where(ids >= 0, codigos_prov[np.maximum(ids, 0)], -1),
+    }
+    banderas = {
+        "empleado": personas["empleado"].to_numpy(dtype=bool),
+        "activo": personas["activo"].to_numpy(dtype=bool),
+    }
+    return {"ids": ids, "dims": dims, "banderas": banderas}
+
+
+def _grouping_set(base, columnas):
+    """Personas distintas por celda para una combinación de dimensiones."""
+    ids = base["ids"]
+    validas = ids >= 0
+    clave = np.zeros(len(ids), dtype=np.int64)
+    for col in columnas:
+        dim = base["dims"][col]
+        validas &= dim["codigos"] >= 0
+        clave = clave * (len(dim["valores"]) + 1) + dim["codigos"] + 1
+
+    # (celda, persona) distintos -> conteos por celda
+    celdas, celda = np.unique(clave[validas], return_inverse=True)
+    n = claves.total()
+    pares = np.unique(celda.astype(np.int64) * n + ids[validas])
+    celda, personas = pares // n, pares % n
+
+    res = {
+        "celdas": celdas,
+        "total_graduados": np.bincount(celda, minlength=len(celdas)),
+    }
+    for medida, bandera in MEDIDAS.items():
+        if bandera is not None:
+            res[medida] = np.bincount(
+                celda,
+                weights=base["banderas"][bandera][personas],
+                minlength=len(celdas),
+            ).astype(np.int64)
+    return res
+
+
+def _construir_cubo():
+    base = _construir_base()
+    conjuntos = {}
+    for k in (1, 2):
+        for columnas in itertools.combinations(DIMENSIONES, k):
+            conjuntos[columnas] = _grouping_set(base, columnas)
+    return {"base": base, "conjuntos": conjuntos}
+
+
+def cubo():
+    """El cubo compartido (base + grouping sets calculados)."""
+    return get_derived("cubo_empleo", _construir_cubo)
+
+
+def _conjunto(columnas):
+    datos = cubo()
+    columnas = tuple(c for c in DIMENSIONES if c in columnas)
+    conjunto = datos["conjuntos"].get(columnas)
+    if conjunto is None:
+        # Las sesiones corren en hilos distintos: un solo cálculo por grouping
+        # set aunque varias lo pidan a la vez
+        with _CONJUNTOS_LOCK:
+            conjunto = datos["conjuntos"].get(columnas)
+            if conjunto is None:
+                # Se guarda en el mismo cubo: vale hasta la próxima recarga
+                conjunto = _grouping_set(datos["base"], columnas)
+                datos["conjuntos"][columnas] = conjunto
+    return columnas, conjunto, datos["base"]
+
+
+def consultar(filtros_sel=None, por=()):
+    """
+    Personas graduadas, empleadas y activas por grupo.
+
+    Parameters:
+    -----------
+    filtros_sel : dict, optional
+        {dimensión: valor}; 'Todos' o None no filtran
+    por : list of str
+        Dimensiones por las que agrupar (de DIMENSIONES)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Una fila por grupo con al menos un graduado, ordenada por los
+        valores de `por`, con total_graduados, total_empleados y total_activos
+    """
+    filtros_sel = {
+        col: str(valor)
+        for col, valor in (filtros_sel or {}).items()
+        if valor is not None and valor != "Todos"
+    }
+    por = list(por)
+    columnas, conjunto, base = _conjunto(set(filtros_sel) | set(por))
+
+    # Decodificar la clave de cada celda (radix mixto, en orden inverso)
+    codigos = {}
+    resto = conjunto["celdas"]
+    for col in reversed(columnas):
+        base_col = len(base["dims"][col]["valores"]) + 1
+        codigos[col] = resto % base_col - 1
+        resto = resto // base_col
+
+    mascara = np.ones(len(conjunto["celdas"]), dtype=bool)
+    for col, valor in filtros_sel.items():
+        codigo = base["dims"][col]["valores"]
+        codigo = codigo.index(valor) if valor in codigo else -2
+        mascara &= codigos[col] == codigo
+
+    res = pd.DataFrame(
+        {
+            col: np.asarray(base["dims"][col]["valores"], dtype=object)[
+                codigos[col][mascara]
+            ]
+            for col in por
+        }
+    )
+    for medida in MEDIDAS:
+        res[medida] = conjunto[medida][mascara]
+
+    if not por:
+        # Sin agrupar: una fila con el total (las celdas ya son una sola)
+        return res.sum().to_frame().T.astype(np.int64)
+    return res.sort_values(por, kind="mergesort").reset_index(drop=True)
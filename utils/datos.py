@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import copy
 import os
+import threading
 
 # Import the new Excel data loader instead of SQL connection
-from utils.excel_data import load_excel_table
+from utils.excel_data import load_excel_tables
+from utils import claves
 
 # Define the key tables required by the application
 REQUIRED_TABLES = [
@@ -16,79 +19,318 @@ REQUIRED_TABLES = [
     "DataSociedades",
 ]
 
+# Copy-on-write lets pages receive shallow views of the shared tables: any
+# write on a page materializes a private copy instead of touching the store.
+# It is always on from pandas 3.0.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
-def init_data():
+DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db")
+
+# Process-wide table store shared by every browser session.
+# Each table is loaded the first time a page asks for it and is then reused
+# by every session of the server process. Tables must be treated as read-only.
+_STORE = {
+    "tables": {},
+    "failed": set(),
+    "derived": {},
+    "version": 1,
+}
+_STORE_LOCK = threading.Lock()
+_TABLE_LOCKS = {}
+_DERIVED_LOCKS = {}
+
+
+def _load_tables(tables):
     """
-    Initialize and cache all required data tables in session state.
-    Loads data from Excel files in the db directory.
+    Load the given tables into the shared store, skipping the ones already
+    there. Workbooks that need parsing are parsed in parallel, and concurrent
+    requests for the same table wait for a single load.
     """
-    if "_data_original" not in st.session_state:
-        st.session_state["_data_original"] = {}
+    pending = [
+        t
+        for t in dict.fromkeys(tables)
+        if t not in _STORE["tables"] and t not in _STORE["failed"]
+    ]
+    if not pending:
+        return
 
-        # Check if db directory exists
-        db_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db"
-        )
+    with _STORE_LOCK:
+        locks = [_TABLE_LOCKS.setdefault(t, threading.Lock()) for t in pending]
+
+    # Always acquire in the same order to avoid deadlocks between sessions
+    order = sorted(range(len(pending)), key=lambda i: pending[i])
+    for i in order:
+        locks[i].acquire()
+    try:
+        pending = [
+            t
+            for t in pending
+            if t not in _STORE["tables"] and t not in _STORE["failed"]
+        ]
+        if not pending:
+            return
+
+        version = _STORE["version"]
+        loaded = load_excel_tables(pending)
+
+        with _STORE_LOCK:
+            # A reload happened meanwhile: the next request loads them again
+            if version != _STORE["version"]:
+                return
+
+            for table, df in loaded.items():
+                # Ensure we have data
+                if df.empty:
+                    _STORE["failed"].add(table)
+                    continue
+
+                # Normalize column names (consistent with SQL version)
+                df.columns = df.columns.str.strip().str.lower()
 
-        if not os.path.exists(db_dir):
-            st.error(f"¡Error! No se encontró la carpeta de datos: {db_dir}")
+                # Shared integer key: same cedula -> same cedula_id in every table
+                if "cedula" in df.columns:
+                    cedula = claves.registrar(df["cedula"])
+                    df = df.assign(cedula=cedula, cedula_id=claves.codigos(cedula))
+                _STORE["tables"][table] = df
+
+            # New cedulas were appended to the dictionary: give every stored
+            # table the same categories again (codes do not change)
+            for table, df in _STORE["tables"].items():
+                if "cedula" in df.columns:
+                    cedula = claves.alinear(df["cedula"])
+                    if cedula is not df["cedula"]:
+                        _STORE["tables"][table] = df.assign(cedula=cedula)
+    finally:
+        for i in order:
+            locks[i].release()
+
+
+def init_data(tables=None):
+    """
+    Load the requested tables into the shared store and report their status
+    once per session. Only the requested tables are read from disk, so a page
+    pays only for what it uses.
+
+    Parameters:
+    -----------
+    tables : list of str, optional
+        Tables the page needs (default: all REQUIRED_TABLES)
+    """
+    if tables is None:
+        tables = REQUIRED_TABLES
+
+    if not os.path.exists(DB_DIR):
+        if not st.session_state.get("_data_dir_error_shown"):
+            st.session_state["_data_dir_error_shown"] = True
+            st.error(f"¡Error! No se encontró la carpeta de datos: {DB_DIR}")
             st.info(
                 "Por favor, crea una carpeta 'db' en el directorio raíz y coloca los archivos Excel con los datos."
             )
             # Add instructions for required files
             st.code("\n".join([f"{table}.xlsx" for table in REQUIRED_TABLES]))
-            return
+        return
 
-        # Check and list available files
-        available_files = os.listdir(db_dir)
+    _load_tables(tables)
 
-        # Check which required files are missing
-        excel_files = [f for f in available_files if f.endswith(".xlsx")]
-        missing_files = [
-            f"{table}.xlsx"
-            for table in REQUIRED_TABLES
-            if f"{table}.xlsx" not in excel_files
-        ]
+    # Report only the tables this session has not seen yet
+    shown = st.session_state.setdefault("_data_status_shown", set())
+    new_tables = [t for t in tables if t not in shown]
+    if not new_tables:
+        return
+    first_report = not shown
+    shown.update(new_tables)
 
-        if missing_files:
-            st.warning(
-                f"Faltan algunos archivos Excel necesarios: {', '.join(missing_files)}"
-            )
-            st.info(
-                "Asegúrate de que los nombres de los archivos coincidan exactamente con los nombres de las tablas."
-            )
+    # Check which requested files are missing
+    excel_files = [f for f in os.listdir(DB_DIR) if f.endswith(".xlsx")]
+    missing_files = [
+        f"{table}.xlsx" for table in new_tables if f"{table}.xlsx" not in excel_files
+    ]
+    if missing_files:
+        st.warning(
+            f"Faltan algunos archivos Excel necesarios: {', '.join(missing_files)}"
+        )
+        st.info(
+            "Asegúrate de que los nombres de los archivos coincidan exactamente con los nombres de las tablas."
+        )
 
-        # Load all required tables from Excel
-        for table in REQUIRED_TABLES:
-            df = load_excel_table(table)
+    failed_tables = [t for t in new_tables if t not in _STORE["tables"]]
+    for table in failed_tables:
+        st.error(f"No se pudieron cargar los datos para {table} desde Excel.")
 
-            # Ensure we have data
-            if df.empty:
-                st.error(f"No se pudieron cargar los datos para {table} desde Excel.")
-                continue
+    # Check if all tables were loaded successfully
+    if failed_tables:
+        st.error(
+            "Algunos datos no pudieron ser cargados. La aplicación puede funcionar incorrectamente."
+        )
+        st.info(f"Tablas requeridas: {list(tables)}")
+        st.info(f"Tablas cargadas: {list(_STORE['tables'].keys())}")
+    elif first_report:
+        st.success("Datos cargados correctamente desde archivos Excel.")
 
-            # Normalize column names (consistent with SQL version)
-            df.columns = df.columns.str.strip().str.lower()
 
-            # Store in session state
-            st.session_state["_data_original"][table] = df
+def reload_data():
+    """
+    Discard the shared tables and read again, in parallel, the ones that were
+    loaded. The rest are read the next time a page asks for them. Every session
+    sees the new data on its next rerun.
+    """
+    with _STORE_LOCK:
+        loaded_tables = list(_STORE["tables"].keys())
+        _STORE["tables"] = {}
+        _STORE["failed"] = set()
+        _STORE["derived"] = {}
+        _STORE["version"] += 1
+        claves.reiniciar()
 
-        # Check if all tables were loaded successfully
-        loaded_tables = list(st.session_state["_data_original"].keys())
+    _load_tables(loaded_tables)
 
-        if len(loaded_tables) < len(REQUIRED_TABLES):
-            st.error(
-                "Algunos datos no pudieron ser cargados. La aplicación puede funcionar incorrectamente."
-            )
-            st.info(f"Tablas requeridas: {REQUIRED_TABLES}")
-            st.info(f"Tablas cargadas: {loaded_tables}")
-        else:
-            st.success("Datos cargados correctamente desde archivos Excel.")
+
+def get_data_version():
+    """
+    Counter that increases every time the shared store is reloaded.
+    Useful as part of cache keys derived from the tables.
+    """
+    return _STORE["version"]
+
+
+def get_derived(name, build):
+    """
+    Get a structure computed from the shared tables (an index, a lookup...),
+    building it once and reusing it in every session until the next reload.
+
+    Parameters:
+    -----------
+    name : str
+        Unique name of the structure
+    build : callable
+        Function without arguments that computes it
+
+    Returns:
+    --------
+    object
+        The value returned by build
+    """
+    version = _STORE["version"]
+    cached = _STORE["derived"].get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _STORE_LOCK:
+        lock = _DERIVED_LOCKS.setdefault(name, threading.Lock())
+
+    # One build per structure even if several sessions ask at the same time
+    with lock:
+        cached = _STORE["derived"].get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = build()
+        with _STORE_LOCK:
+            if version == _STORE["version"]:
+                _STORE["derived"][name] = (version, value)
+        return value
+
+
+def get_memory_usage():
+    """
+    Memory used by the tables currently held in the shared store.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per loaded table with rows, columns and bytes (deep)
+    """
+    rows = [
+        {
+            "tabla": table,
+            "filas": len(df),
+            "columnas": df.shape[1],
+            "bytes": int(df.memory_usage(index=True, deep=True).sum()),
+        }
+        for table, df in _STORE["tables"].items()
+    ]
+    return pd.DataFrame(rows, columns=["tabla", "filas", "columnas", "bytes"])
+
+
+def get_table(table_name, columns=None):
+    """
+    Get a read-only view of a data table from the shared store.
+
+    No data is copied: the returned frame shares memory with the store and
+    copy-on-write makes a private copy only of what a page modifies.
+
+    Parameters:
+    -----------
+    table_name : str
+        Name of the table to retrieve
+    columns : list of str, optional
+        Columns to keep. Columns missing from the table are ignored so pages
+        can keep their own validations.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        A view of the requested data table (empty if it is not loaded)
+    """
+    # Load the table on demand
+    init_data([table_name])
+
+    tables = _STORE["tables"]
+    if table_name not in tables:
+        st.error(f"La tabla {table_name} no existe en los datos cargados.")
+        return pd.DataFrame()
+
+    df = tables[table_name]
+    if columns is None:
+        return df.copy(deep=False)
+    return df[[c for c in columns if c in df.columns]]
+
+
+def filas_de(table_name, cedula_ids):
+    """
+    Row positions of a table that belong to the given people.
+
+    The cedula_id -> rows index of each table is built once per data version
+    (get_derived), so each call only gathers the rows of the people asked
+    for. Use it to slice any table with the cedula_ids returned by
+    filtros_locales: get_table(name).iloc[filas_de(name, cedula_ids)].
+
+    Parameters:
+    -----------
+    table_name : str
+        Name of the table
+    cedula_ids : array of int
+        cedula_id codes of the people to keep
+
+    Returns:
+    --------
+    numpy.ndarray
+        Positions of their rows, in table order (empty if the table is not
+        loaded or has no cedula_id)
+    """
+    df = get_table(table_name, columns=[claves.COL_ID])
+    if claves.COL_ID not in df.columns:
+        return np.array([], dtype=np.int64)
+    index = get_derived(
+        f"rows_by_cedula:{table_name}",
+        lambda: claves.indice_filas(df[claves.COL_ID].to_numpy()),
+    )
+
+    ids = np.asarray(cedula_ids, dtype=np.int64)
+    starts = index["inicios"]
+    ids = ids[(ids >= 0) & (ids < len(starts) - 1)]
+    begin = starts[ids]
+    lengths = starts[ids + 1] - begin
+    # Ranges [begin, begin + length) concatenated without a Python loop
+    jumps = np.repeat(begin - np.cumsum(lengths) + lengths, lengths)
+    rows = index["orden"][jumps + np.arange(int(lengths.sum()))]
+    return np.sort(rows)
 
 
 def get_data_copy(table_name):
     """
-    Get a deep copy of a data table from session state.
+    Get a deep copy of a data table from the shared store.
+    Prefer get_table unless the whole table really needs to be copied.
 
     Parameters:
     -----------
@@ -100,17 +342,13 @@ def get_data_copy(table_name):
     pandas.DataFrame
         A copy of the requested data table
     """
-    # Ensure data is initialized
-    init_data()
+    # Load the table on demand
+    init_data([table_name])
 
-    if (
-        "_data_original" in st.session_state
-        and table_name in st.session_state["_data_original"]
-    ):
-        df = copy.deepcopy(st.session_state["_data_original"][table_name])
+    tables = _STORE["tables"]
+    if table_name in tables:
+        df = copy.deepcopy(tables[table_name])
         return df
     else:
-        if "_data_original" in st.session_state:
-            pass
         st.error(f"La tabla {table_name} no existe en los datos cargados.")
         return pd.DataFrame()
@@ -0,0 +1,312 @@
+# utils/esquema.py
+from __future__ import annotations
+import unicodedata
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # sin pyarrow se usan las funciones de texto de pandas
+    pa = pc = None
+
+from utils.patronos import canonizar
+
+# Tipos declarados por tabla (nombres de tabla y columna en minúscula).
+#   "id"        -> cédula: categórica (código entero + diccionario con el texto)
+#   "categoria" -> texto de baja cardinalidad: categórica
+#   "bandera"   -> 'S'/'N', 'SI'/'NO'...: bool
+#   "monto"     -> colones: float64 (acepta '9.470.000,00')
+#   "decimal"   -> medida/porcentaje: float32
+#   "entero"    -> int32 (float64 si tiene faltantes)
+#   "fecha"     -> datetime64
+ESQUEMAS = {
+    "graduados": {
+        "cedula": "id",
+        "universidad": "categoria",
+        "grado": "categoria",
+        "facultad": "categoria",
+        "carrera": "categoria",
+        "enfasis": "categoria",
+    },
+    "datalaboral": {
+        "cedula": "id",
+        "actividad_empresa": "categoria",
+        "nombre_patrono": "categoria",
+        "tipo_patrono": "categoria",
+        "ocupacion": "categoria",
+        "clasificacion": "categoria",
+        "labora_actualmente": "bandera",
+        "patrono_es_moroso": "bandera",
+        "salario_base": "monto",
+        "ingreso_aproximado": "monto",
+        "porcentaje_variacion": "decimal",
+        "antiguedad_meses": "entero",
+    },
+    "datalocalizacion": {
+        "cedula": "id",
+        "provincia": "categoria",
+        "canton": "categoria",
+        "distrito": "categoria",
+    },
+    "datainmueble": {
+        "cedula": "id",
+        "horizontal": "categoria",
+        "naturaleza": "categoria",
+        "duplicado": "categoria",
+        "medida": "decimal",
+        "valor_fiscal": "monto",
+    },
+    "datamueble": {
+        "cedula": "id",
+        "categoria": "categoria",
+        "valor_fiscal": "monto",
+        "valor_contrato": "monto",
+        "fecha_adquisicion": "fecha",
+    },
+    "datasociedades": {
+        "cedula": "id",
+        "nombre": "categoria",
+        "puesto": "categoria",
+        "representacion": "categoria",
+    },
+}
+
+# Valores que cuentan como verdadero en las banderas (tras mayúsculas y strip).
+# Antes las páginas comparaban labora_actualmente con 'S'; el conjunto es más
+# amplio porque patrono_es_moroso viene como 'SI'/'NO'. Con los datos
+# actuales labora_actualmente solo trae 'S', así que no cambia; si llegara
+# con 'SI', 'TRUE' o '1', esas filas también cuentan como activas.
+VALORES_VERDADEROS = {"S", "SI", "SÍ", "TRUE", "1"}
+
+
+def to_float_safe(s):
+    """
+    Convierte valores tipo decimal con posibles formatos de Excel/SQL:
+    - '9.470.000,00' -> 9470000.00
+    - '15100,00'     -> 15100.00
+    - 25900.0        -> 25900.0
+    - None/NaN       -> NaN
+    """
+    if pd.isna(s):
+        return np.nan
+    try:
+        # Si ya es numérico
+        if isinstance(s, (int, float, np.number)):
+            return float(s)
+        s = str(s).strip()
+        if s == "":
+            return np.nan
+        # eliminar separadores de miles '.', cambiar coma decimal por punto
+        s = s.replace(".", "").replace(",", ".")
+        return float(s)
+    except Exception:
+        return np.nan
+
+
+# Resultados de pd.api.types.infer_dtype que to_numeric convierte igual que float()
+_TIPOS_NUMERICOS = ("integer", "floating", "mixed-integer-float", "boolean", "empty")
+
+
+def _numeros_a_float(col):
+    if pd.api.types.infer_dtype(col, skipna=True) in _TIPOS_NUMERICOS:
+        return pd.to_numeric(col, errors="coerce").astype("float64")
+    # Sin textos (fechas, decimales...): caso raro, se convierte elemento a elemento
+    return col.map(to_float_safe).astype("float64")
+
+
+def _float_o_nan(s):
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _textos_a_float(textos):
+    """Serie de textos con formato local -> arreglo float64 (NaN si no aplica)."""
+    if pa is not None:
+        arr = pc.utf8_trim_whitespace(pa.array(textos, type=pa.string()))
+        arr = pc.replace_substring(pc.replace_substring(arr, ".", ""), ",", ".")
+        arr = pc.if_else(pc.equal(arr, ""), pa.scalar(None, pa.string()), arr)
+        try:
+            return pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+        except pa.ArrowInvalid:
+            # Algún texto no es un número: se resuelve abajo, fila a fila
+            limpio = pd.Series(arr.to_numpy(zero_copy_only=False), dtype=object)
+    else:
+        limpio = (
+            textos.astype(object)
+            .str.strip()
+            .str.replace(".", "", regex=False)
+            .str.replace(",", ".", regex=False)
+        )
+
+    valores = pd.to_numeric(limpio, errors="coerce").astype("float64")
+    # float() acepta algunas formas que to_numeric no ('1_000', ' 1'...)
+    fallidos = valores.isna() & limpio.notna() & (limpio != "")
+    if fallidos.any():
+        valores[fallidos] = limpio[fallidos].map(_float_o_nan)
+    return valores.to_numpy()
+
+
+def to_float_series(col):
+    """
+    Versión vectorizada de to_float_safe para una columna completa, con el
+    mismo resultado: los números pasan tal cual y los textos con formato
+    local ('9.470.000,00') se convierten quitando los '.' de miles y usando
+    la ',' como decimal. Lo que no se puede convertir queda como NaN.
+    """
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col.astype("float64")
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Se convierte cada categoría una sola vez
+        por_categoria = to_float_series(pd.Series(col.cat.categories, dtype=object))
+        valores = np.append(por_categoria.to_numpy(), np.nan)[col.cat.codes]
+        return pd.Series(valores, index=col.index, name=col.name)
+
+    tipo = pd.api.types.infer_dtype(col, skipna=True)
+    if tipo not in ("string", "mixed", "mixed-integer"):
+        return _numeros_a_float(col)
+
+    if tipo == "string":
+        es_texto = col.notna().to_numpy()
+    else:
+        es_texto = np.fromiter(
+            (isinstance(v, str) for v in col), dtype=bool, count=len(col)
+        )
+
+    resultado = np.full(len(col), np.nan)
+    if not es_texto.all():
+        resultado[~es_texto] = _numeros_a_float(col[~es_texto]).to_numpy()
+    if es_texto.any():
+        resultado[es_texto] = _textos_a_float(col[es_texto])
+    return pd.Series(resultado, index=col.index, name=col.name)
+
+
+def _a_bandera(col):
+    if pd.api.types.is_bool_dtype(col):
+        return col.fillna(False).astype(bool)
+    texto = col.astype(str).str.upper().str.strip()
+    return texto.isin(VALORES_VERDADEROS).astype(bool)
+
+
+def _a_entero(col):
+    col = pd.to_numeric(col, errors="coerce")
+    if col.isna().any():
+        return col.astype("float64")
+    return col.astype("int32")
+
+
+def _a_categoria(col):
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col
+    return col.astype("category")
+
+
+CONVERSORES = {
+    "id": _a_categoria,
+    "categoria": _a_categoria,
+    "bandera": _a_bandera,
+    "monto": to_float_series,
+    "decimal": lambda col: pd.to_numeric(col, errors="coerce").astype("float32"),
+    "entero": _a_entero,
+    "fecha": lambda col: pd.to_datetime(col, errors="coerce"),
+}
+
+
+def normalizar_texto(s):
+    """Texto sin tildes, sin espacios extremos y en mayúscula ('' si falta)."""
+    if pd.isna(s):
+        return ""
+    s = str(s).strip()
+    s = "".join(
+        c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn"
+    )
+    return s.upper()
+
+
+def _mapear_categorias(col, funcion):
+    """
+    Aplica `funcion` a cada categoría (no a cada fila) y devuelve una
+    categórica; los resultados vacíos quedan como faltantes.
+    """
+    col = _a_categoria(col)
+    nuevas = pd.Index([funcion(c) for c in col.cat.categories], dtype=object)
+    nuevas = nuevas.where(nuevas != "", np.nan)
+    valores = np.append(nuevas.to_numpy(dtype=object), np.nan)[col.cat.codes]
+    return pd.Series(valores, index=col.index, dtype="category", name=col.name)
+
+
+def _normalizar_laboral(df):
+    # Patronos sin nombre real cuentan como faltantes
+    sin_nombre = {"", "SIN INFORMACION", "NA"}
+    cambios = {}
+    if "nombre_patrono" in df.columns:
+        nombre = _mapear_categorias(
+            df["nombre_patrono"],
+            lambda c: "" if str(c).strip() in sin_nombre else str(c).strip(),
+        )
+        cambios["nombre_patrono"] = nombre
+
+        # Empleador canónico de cada fila (ver utils.patronos): el mismo
+        # empleador escrito de varias formas queda con un solo patrono_id
+        codigos = nombre.cat.codes.to_numpy()
+        filas = np.bincount(codigos[codigos >= 0], minlength=len(nombre.cat.categories))
+        tabla = canonizar(nombre.cat.categories, filas)
+        patrono_id = np.append(tabla["patrono_id"].to_numpy(), -1)[codigos]
+        canonicos = tabla.drop_duplicates("patrono_id").sort_values("patrono_id")
+        cambios["patrono_id"] = pd.Series(
+            patrono_id.astype("int32"), index=df.index, name="patrono_id"
+        )
+        cambios["nombre_patrono_canonico"] = pd.Series(
+            pd.Categorical.from_codes(
+                patrono_id, categories=canonicos["nombre_canonico"].to_numpy()
+            ),
+            index=df.index,
+            name="nombre_patrono_canonico",
+        )
+    return cambios
+
+
+def _normalizar_localizacion(df):
+    cambios = {}
+    if "provincia" in df.columns:
+        cambios["provincia_norm"] = _mapear_categorias(
+            df["provincia"], normalizar_texto
+        )
+    return cambios
+
+
+# Limpiezas y columnas derivadas que se calculan una sola vez al cargar
+NORMALIZACIONES = {
+    "datalaboral": _normalizar_laboral,
+    "datalocalizacion": _normalizar_localizacion,
+}
+
+
+def aplicar_esquema(tabla, df):
+    """
+    Convierte las columnas de una tabla a los tipos declarados en ESQUEMAS y
+    aplica su normalización (NORMALIZACIONES). Las columnas no declaradas (o
+    tablas sin esquema) se dejan igual.
+    """
+    esquema = ESQUEMAS.get(tabla.lower(), {})
+    cambios = {
+        col: CONVERSORES[tipo](df[col])
+        for col, tipo in esquema.items()
+        if col in df.columns
+    }
+    if cambios:
+        df = df.assign(**cambios)
+
+    normalizar = NORMALIZACIONES.get(tabla.lower())
+    if normalizar is not None:
+        cambios = normalizar(df)
+        if cambios:
+            df = df.assign(**cambios)
+    return df
+
+
+def memoria(df):
+    """Bytes ocupados por un DataFrame, contando el contenido de los textos."""
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -1,53 +1,270 @@
 import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import openpyxl
 import logging
 
+from utils.esquema import aplicar_esquema, memoria
+
 # Path to the Excel files
 EXCEL_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db"
 )
 
+# Columnar copies of the normalized tables (one Parquet file + metadata per table)
+CACHE_DIR = os.path.join(EXCEL_DIR, ".cache")
+
+# Bump when the normalization of the tables changes so old caches are ignored
+CACHE_FORMAT = 6
+
+# Columns no page uses; they are not even parsed (normalized table name -> columns)
+SKIP_COLUMNS = {
+    "datalocalizacion": ["telefono"],
+}
+
+# Rows buffered as Python values before converting them to typed columns
+STREAM_CHUNK_ROWS = 50_000
+
+# Strings pd.read_excel reads as missing values (pandas' default na_values)
+_NA_STRINGS = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+logger = logging.getLogger(__name__)
+
 
-def load_excel_table(tabla):
+def _find_excel_file(tabla):
     """
-    Load a table from an Excel file in the db directory.
+    Resolve the path of the Excel file for a table, or None if it does not exist.
+    """
+    # Check if db directory exists
+    if not os.path.exists(EXCEL_DIR):
+        return None
+
+    # Construct file path with proper case handling
+    # Try with exact case first
+    file_path = os.path.join(EXCEL_DIR, f"{tabla}.xlsx")
+
+    # If file doesn't exist, try case-insensitive search
+    if not os.path.exists(file_path):
+        # List available files for debugging
+        excel_files = [f for f in os.listdir(EXCEL_DIR) if f.endswith(".xlsx")]
+
+        # Try to find a case-insensitive match
+        for file in excel_files:
+            if file.lower() == f"{tabla.lower()}.xlsx":
+                file_path = os.path.join(EXCEL_DIR, file)
+                break
+
+    # Check if file exists after case-insensitive search
+    if not os.path.exists(file_path):
+        return None
+    return file_path
+
+
+def _file_hash(file_path):
+    """
+    SHA-256 of the file contents, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(tabla):
+    base = os.path.join(CACHE_DIR, tabla.lower())
+    return base + ".parquet", base + ".json"
+
+
+def _read_cache(tabla, file_path):
+    """
+    Return the cached DataFrame for a table if it is still valid, else None.
+
+    The cache is valid when the source file has the same size and mtime it had
+    when the cache was written. If only the mtime changed (e.g. the file was
+    touched or copied) the contents hash decides, and the metadata is refreshed.
+    """
+    data_path, meta_path = _cache_paths(tabla)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        stat = os.stat(file_path)
+        if meta.get("format") != CACHE_FORMAT or meta.get("size") != stat.st_size:
+            return None
+
+        if meta.get("mtime_ns") != stat.st_mtime_ns:
+            if meta.get("sha256") != _file_hash(file_path):
+                return None
+            meta["mtime_ns"] = stat.st_mtime_ns
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        return pd.read_parquet(data_path)
+    except Exception:
+        logger.warning("No se pudo leer la caché de %s", tabla, exc_info=True)
+        return None
+
+
+def _write_cache(tabla, file_path, df):
+    """
+    Store a normalized table as Parquet next to the signature of its source file.
+    Failures (read-only disk, pyarrow missing, mixed-type columns) are ignored.
+    """
+    data_path, meta_path = _cache_paths(tabla)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        stat = os.stat(file_path)
+        meta = {
+            "format": CACHE_FORMAT,
+            "source": os.path.basename(file_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _file_hash(file_path),
+        }
+        # Write to a temporary file first so a crash never leaves a partial cache
+        tmp_path = data_path + ".tmp"
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, data_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except Exception:
+        logger.warning("No se pudo escribir la caché de %s", tabla, exc_info=True)
+
+
+def read_excel_streaming(
+    file_path, columns=None, skip_columns=None, chunk_rows=STREAM_CHUNK_ROWS
+):
+    """
+    Read the first sheet of a workbook as a stream of rows.
+
+    pd.read_excel builds openpyxl's full cell tree for the sheet before pandas
+    sees a single row. Here the workbook is opened in read-only mode and rows
+    are iterated one at a time: only the selected columns are kept, and every
+    ``chunk_rows`` rows the buffered values are converted to typed columns.
+    Peak memory is the resulting columns plus one chunk of Python values.
+    Fully empty rows are skipped, as pd.read_excel does.
 
     Parameters:
     -----------
-    tabla : str
-        Name of the table to load (without file extension)
+    file_path : str
+        Path of the .xlsx file
+    columns : list of str, optional
+        Columns to keep (case and surrounding spaces are ignored). Default: all
+    skip_columns : list of str, optional
+        Columns to leave out
+    chunk_rows : int
+        Rows converted per chunk
 
     Returns:
     --------
     pandas.DataFrame
-        The loaded table data or empty DataFrame if file not found
+        The sheet with the header row as column names
     """
+    wanted = None if columns is None else {c.strip().lower() for c in columns}
+    skipped = {c.strip().lower() for c in (skip_columns or [])}
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
     try:
-        # Check if db directory exists
-        if not os.path.exists(EXCEL_DIR):
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
             return pd.DataFrame()
 
-        # List available files for debugging
-        excel_files = [f for f in os.listdir(EXCEL_DIR) if f.endswith(".xlsx")]
+        names = [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+        keep = [
+            i
+            for i, name in enumerate(names)
+            if (wanted is None or name.strip().lower() in wanted)
+            and name.strip().lower() not in skipped
+        ]
 
-        # Construct file path with proper case handling
-        # Try with exact case first
-        file_path = os.path.join(EXCEL_DIR, f"{tabla}.xlsx")
+        buffers = [[] for _ in keep]
+        chunks = [[] for _ in keep]
 
-        # If file doesn't exist, try case-insensitive search
-        if not os.path.exists(file_path):
-            # Try to find a case-insensitive match
-            for file in excel_files:
-                if file.lower() == f"{tabla.lower()}.xlsx":
-                    file_path = os.path.join(EXCEL_DIR, file)
-                    break
+        def flush():
+            for j, buf in enumerate(buffers):
+                chunk = pd.Series(buf)
+                if pd.api.types.is_string_dtype(chunk):
+                    chunk = chunk.where(~chunk.isin(_NA_STRINGS))
+                chunks[j].append(chunk)
+                buffers[j] = []
 
-        # Check if file exists after case-insensitive search
-        if not os.path.exists(file_path):
-            return pd.DataFrame()
+        n_cols = len(names)
+        buffered = 0
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            if len(row) < n_cols:
+                row = row + (None,) * (n_cols - len(row))
+            for buf, i in zip(buffers, keep):
+                buf.append(row[i])
+            buffered += 1
+            if buffered == chunk_rows:
+                flush()
+                buffered = 0
+        if buffered:
+            flush()
+    finally:
+        wb.close()
 
-        # Read Excel file
-        df = pd.read_excel(file_path)
+    data = {}
+    for j, i in enumerate(keep):
+        parts = chunks[j]
+        if not parts:
+            data[names[i]] = pd.Series(dtype=object)
+        elif len(parts) == 1:
+            data[names[i]] = parts[0]
+        else:
+            data[names[i]] = pd.concat(parts, ignore_index=True)
+        chunks[j] = None
+
+        # Like pd.read_excel, text columns whose values are all numbers
+        # (e.g. cedulas stored as text) become numeric
+        if pd.api.types.is_string_dtype(data[names[i]]):
+            try:
+                data[names[i]] = pd.to_numeric(data[names[i]])
+            except (ValueError, TypeError):
+                pass
+    return pd.DataFrame(data)
+
+
+def _parse_excel_table(tabla, file_path, typed=True):
+    """
+    Parse a workbook and normalize it. Module-level so it can run in a worker
+    process; any error yields an empty DataFrame.
+    """
+    try:
+        # Read Excel file (streamed, without the columns no page uses)
+        df = read_excel_streaming(
+            file_path, skip_columns=SKIP_COLUMNS.get(tabla.lower())
+        )
 
         # Check if DataFrame is empty
         if df.empty:
@@ -65,6 +282,147 @@ def load_excel_table(tabla):
             df["anio_graduacion"] = df["anio_graduacion"].astype(str).str.strip()
             df = df[df.anio_graduacion != "2025"]
 
+        # Compact types declared per table (categories, bools, floats)
+        if typed:
+            antes = memoria(df)
+            df = aplicar_esquema(tabla, df)
+            logger.info(
+                "%s: %.1f MB -> %.1f MB con esquema",
+                tabla,
+                antes / 1e6,
+                memoria(df) / 1e6,
+            )
+
         return df
     except Exception:
         return pd.DataFrame()
+
+
+def load_excel_table(tabla, use_cache=True, typed=True):
+    """
+    Load a table from an Excel file in the db directory.
+
+    The first load of a table parses the workbook and writes a Parquet copy of
+    the normalized result to ``db/.cache``. Later loads read that copy while the
+    source file keeps the same size, mtime or contents hash.
+
+    Parameters:
+    -----------
+    tabla : str
+        Name of the table to load (without file extension)
+    use_cache : bool
+        Read and write the columnar cache (default True)
+    typed : bool
+        Convert the columns to the types declared in utils.esquema (default
+        True). Untyped tables are never cached.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The loaded table data or empty DataFrame if file not found
+    """
+    try:
+        file_path = _find_excel_file(tabla)
+        if file_path is None:
+            return pd.DataFrame()
+
+        use_cache = use_cache and typed
+        if use_cache:
+            cached = _read_cache(tabla, file_path)
+            if cached is not None:
+                return cached
+
+        df = _parse_excel_table(tabla, file_path, typed)
+
+        if use_cache and not df.empty:
+            _write_cache(tabla, file_path, df)
+
+        return df
+    except Exception:
+        return pd.DataFrame()
+
+
+def _default_workers():
+    """
+    Worker processes for parallel parsing: ``EXCEL_WORKERS`` if set, else the
+    number of CPUs. A value of 1 forces serial parsing.
+    """
+    try:
+        return max(1, int(os.environ.get("EXCEL_WORKERS", "")))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def load_excel_tables(tablas, max_workers=None, use_cache=True):
+    """
+    Load several tables, parsing the workbooks that are not cached in
+    parallel worker processes.
+
+    openpyxl parsing is CPU-bound, so each workbook is parsed in its own
+    process and the resulting DataFrames are sent back to this process, which
+    also writes the columnar cache. With enough workers the total time is close
+    to that of the largest workbook. If the pool cannot be started (or
+    ``max_workers`` is 1) the workbooks are parsed serially.
+
+    Parameters:
+    -----------
+    tablas : list of str
+        Names of the tables to load (without file extension)
+    max_workers : int, optional
+        Maximum worker processes (default: ``EXCEL_WORKERS`` or the CPU count)
+    use_cache : bool
+        Read and write the columnar cache (default True)
+
+    Returns:
+    --------
+    dict
+        {tabla: DataFrame}, with an empty DataFrame for tables that could not
+        be loaded
+    """
+    result = {}
+    pending = {}
+
+    for tabla in tablas:
+        file_path = _find_excel_file(tabla)
+        if file_path is None:
+            result[tabla] = pd.DataFrame()
+            continue
+        cached = _read_cache(tabla, file_path) if use_cache else None
+        if cached is not None:
+            result[tabla] = cached
+        else:
+            pending[tabla] = file_path
+
+    if max_workers is None:
+        max_workers = _default_workers()
+    workers = min(max_workers, len(pending))
+
+    parsed = {}
+    if workers > 1:
+        try:
+            # spawn: forking a multi-threaded server process is not safe
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                futures = {
+                    tabla: pool.submit(_parse_excel_table, tabla, file_path)
+                    for tabla, file_path in pending.items()
+                }
+                for tabla, future in futures.items():
+                    parsed[tabla] = future.result()
+        except Exception:
+            logger.warning(
+                "Falló la lectura en paralelo; se continúa en serie", exc_info=True
+            )
+
+    # Serial path, also used for whatever the pool did not finish
+    for tabla, file_path in pending.items():
+        if tabla not in parsed:
+            parsed[tabla] = _parse_excel_table(tabla, file_path)
+
+    for tabla, df in parsed.items():
+        if use_cache and not df.empty:
+            _write_cache(tabla, pending[tabla], df)
+        result[tabla] = df
+
+    return {tabla: result[tabla] for tabla in tablas}
@@ -1,8 +1,13 @@
 # utils/filtros.py
 from __future__ import annotations
+import threading
+from collections import OrderedDict
+import numpy as np
 import streamlit as st
 import pandas as pd
 
+from utils.datos import get_data_version, get_derived, get_table
+
 # Mapeo etiqueta -> nombre de columna real
 ORDER = [
     ("Universidad", "universidad"),
@@ -14,56 +19,192 @@ ORDER = [
     ("Periodo", "cod_graduacion"),
 ]
 COL_ID = "cedula"
+COL_ID_NUM = "cedula_id"
 
+# Caché LRU compartida por todas las sesiones:
+# (versión de datos, selecciones previas) -> (filas, opciones del nivel)
+CACHE_MAX_ENTRADAS = 256
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
 
-def _norm(df):
-    d = df.copy()
-    d.columns = d.columns.str.strip().str.lower()
-    return d
 
+def _indexar_columna(col):
+    """
+    Índice de una dimensión:
+      - valores: textos distintos ordenados (como en los selectbox)
+      - codigos: posición de cada fila en `valores` (-1 si falta)
+      - posiciones: filas (ordenadas) de cada valor
+    """
+    texto = col.astype(str).where(col.notna())
+    codigos, valores = pd.factorize(texto, sort=True)
+    codigos = codigos.astype(np.int32)
+
+    orden = np.argsort(codigos, kind="stable")
+    conteos = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+    validas = orden[len(codigos) - int(conteos.sum()) :]
+    posiciones = np.split(validas, np.cumsum(conteos)[:-1]) if len(valores) else []
+
+    valores = [str(v) for v in valores]
+    return {
+        "valores": valores,
+        "codigo_de": {v: i for i, v in enumerate(valores)},
+        "codigos": codigos,
+        "posiciones": posiciones,
+    }
+
+
+def construir_indice(df_graduados):
+    """Índice de filtros sobre las filas de Graduados, una entrada por dimensión."""
+    return {
+        "filas": len(df_graduados),
+        "dims": {
+            col: _indexar_columna(df_graduados[col])
+            for _, col in ORDER
+            if col in df_graduados.columns
+        },
+    }
+
+
+def _direcciones(col):
+    """Direcciones de memoria de los datos de una columna."""
+    datos = col.array
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        datos = datos.codes
+    elif hasattr(datos, "__arrow_array__"):
+        # Textos en pyarrow: las direcciones de sus buffers
+        return tuple(
+            b.address
+            for trozo in datos.__arrow_array__().chunks
+            for b in trozo.buffers()
+            if b is not None
+        )
+    return (np.asarray(datos).__array_interface__["data"][0],)
+
+
+def _es_vista(df, tabla):
+    """True si df comparte con `tabla` las filas y las columnas de filtro."""
+    if len(df) != len(tabla):
+        return False
+    for col in [COL_ID_NUM] + [col for _, col in ORDER]:
+        if (col in df.columns) != (col in tabla.columns):
+            return False
+        if col in df.columns and _direcciones(df[col]) != _direcciones(tabla[col]):
+            return False
+    return True
+
+
+def obtener_indice(df_graduados):
+    """
+    Devuelve (índice, compartido). El índice compartido se construye sobre la
+    tabla Graduados completa y se usa solo si df_graduados es una vista de
+    ella (mismas filas y columnas); otro DataFrame se indexa aparte, sin la
+    caché.
+    """
+    indice = get_derived(
+        "indice_filtros", lambda: construir_indice(get_table("Graduados"))
+    )
+    if not _es_vista(df_graduados, get_table("Graduados")):
+        return construir_indice(df_graduados), False
+    return indice, True
 
-def _options(df, col):
-    if col not in df.columns:
-        return []
-    vals = df[col].dropna().astype(str).sort_values().unique().tolist()
-    return ["Todos"] + vals
 
+def _options(dim, filas):
+    """Valores presentes entre las filas dadas (todas si filas es None)."""
+    codigos = dim["codigos"] if filas is None else dim["codigos"][filas]
+    presentes = np.bincount(codigos[codigos >= 0], minlength=len(dim["valores"]))
+    return [dim["valores"][i] for i in np.flatnonzero(presentes)]
 
-def _options_universidad(df, col):
-    """Opciones especiales para Universidad: sin 'Todos', con ULATINA por defecto."""
-    if col not in df.columns:
-        return []
-    vals = df[col].dropna().astype(str).sort_values().unique().tolist()
-    return vals
 
+def _apply(dim, filas, selected):
+    if (selected is None) or (selected == "Todos"):
+        return filas
+    codigo = dim["codigo_de"].get(str(selected))
+    if codigo is None:
+        return np.array([], dtype=np.intp)
+    posiciones = dim["posiciones"][codigo]
+    if filas is None:
+        return posiciones
+    return np.intersect1d(filas, posiciones, assume_unique=True)
 
-def _apply(df, col, selected):
-    if (selected is None) or (selected == "Todos") or (col not in df.columns):
-        return df
-    return df[df[col].astype(str) == str(selected)]
+
+def _nivel(indice, compartido, prefijo, filas_previas):
+    """
+    Filas y opciones del nivel len(prefijo) de ORDER dadas las selecciones
+    previas. `filas_previas` son las filas del nivel anterior y solo se usan
+    si hay que calcularlo.
+    """
+    clave = (get_data_version(), prefijo)
+    if compartido:
+        with _CACHE_LOCK:
+            valor = _CACHE.get(clave)
+            if valor is not None:
+                _CACHE.move_to_end(clave)
+                _CACHE_STATS["hits"] += 1
+                return valor
+            _CACHE_STATS["misses"] += 1
+
+    nivel = len(prefijo)
+    filas = filas_previas
+    if nivel:
+        filas = _apply(indice["dims"][ORDER[nivel - 1][1]], filas, prefijo[-1])
+    if filas is not None:
+        # Compartidas entre sesiones: int32 y de solo lectura
+        filas = filas.astype(np.int32)
+        filas.flags.writeable = False
+    opts = None
+    if nivel < len(ORDER):
+        opts = _options(indice["dims"][ORDER[nivel][1]], filas)
+    valor = (filas, opts)
+
+    if compartido:
+        with _CACHE_LOCK:
+            # Las entradas de versiones anteriores ya no sirven
+            if _CACHE and next(iter(_CACHE))[0] != clave[0]:
+                _CACHE.clear()
+            _CACHE[clave] = valor
+            while len(_CACHE) > CACHE_MAX_ENTRADAS:
+                _CACHE.popitem(last=False)
+    return valor
+
+
+def estadisticas_cache():
+    """Aciertos, fallos y tamaño de la caché de opciones de los filtros."""
+    with _CACHE_LOCK:
+        consultas = _CACHE_STATS["hits"] + _CACHE_STATS["misses"]
+        return {
+            "hits": _CACHE_STATS["hits"],
+            "misses": _CACHE_STATS["misses"],
+            "tasa_aciertos": _CACHE_STATS["hits"] / consultas if consultas else 0.0,
+            "entradas": len(_CACHE),
+            "max_entradas": CACHE_MAX_ENTRADAS,
+        }
 
 
 def filtros_locales(df_graduados):
     """
     Renderiza filtros en cascada y retorna:
       - df_grad_filtrado
-      - set de cédulas filtradas
+      - arreglo ordenado de cedula_id (int32) de las personas filtradas
+        (sus filas en otra tabla: datos.filas_de)
       - dict {EtiquetaFiltro: valor_seleccionado o 'Todos'}
     """
-    df = _norm(df_graduados)
+    df = df_graduados
 
     # Validaciones mínimas
-    missing = [c for _, c in ORDER if c not in df.columns] + (
-        [COL_ID] if COL_ID not in df.columns else []
-    )
+    missing = [c for _, c in ORDER if c not in df.columns] + [
+        c for c in (COL_ID, COL_ID_NUM) if c not in df.columns
+    ]
     if missing:
         st.error(f"Faltan columnas en Graduados: {', '.join(missing)}")
         st.stop()
 
     st.markdown(f"### Filtros")
 
+    indice, compartido = obtener_indice(df)
     selections = {}
-    df_step = df
+    prefijo = ()
+    filas = None  # None = todas las filas
 
     # Procesar filtros en grupos de 2
     for i in range(0, len(ORDER), 2):
@@ -74,9 +215,10 @@ def filtros_locales(df_graduados):
                 break
 
             label, col = ORDER[idx]
+            filas, opts = _nivel(indice, compartido, prefijo, filas)
             with cols[j]:
                 if label == "Universidad":
-                    opts = _options_universidad(df_step, col)
+                    # Sin 'Todos', con ULATINA por defecto
                     if not opts:
                         selected = None
                     else:
@@ -87,17 +229,16 @@ def filtros_locales(df_graduados):
                             label, options=opts, index=default_index, key=f"flt_{label}"
                         )
                 else:
-                    opts = _options(df_step, col)
-                    if not opts:
-                        selected = "Todos"
-                    else:
-                        selected = st.selectbox(
-                            label, options=opts, index=0, key=f"flt_{label}"
-                        )
+                    selected = st.selectbox(
+                        label, options=["Todos"] + opts, index=0, key=f"flt_{label}"
+                    )
 
                 selections[label] = selected
-                df_step = _apply(df_step, col, selected)
+                prefijo = prefijo + (selected,)
+
+    filas, _ = _nivel(indice, compartido, prefijo, filas)
 
-    df_filtrado = df_step
-    cedulas = set(df_filtrado[COL_ID].dropna().astype(str).unique().tolist())
+    df_filtrado = df if filas is None else df.iloc[filas]
+    ids = df_filtrado[COL_ID_NUM].to_numpy()
+    cedulas = np.unique(ids[ids >= 0])
     return df_filtrado, cedulas, selections
@@ -0,0 +1,109 @@
+# utils/heatmap.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from utils import claves
+from utils.metricas import bandera_empleo, contar_personas
+
+# Motor del heatmap de empleabilidad: filas y columnas se codifican como
+# enteros densos y los conteos de cada celda (personas distintas) se llenan de
+# una vez con bincount sobre el índice plano fila * columnas + columna, en vez
+# de pivotar la misma tabla varias veces. El Top N de filas se elige con
+# argpartition, sin ordenar todas las filas.
+
+
+def construir_matriz(df, fila, columna, grupo=None, empleo="empleado"):
+    """
+    Matrices de graduados y empleados únicos por fila x columna.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Filas de Graduados ya filtradas, con cedula_id, `fila` y `columna`
+    fila, columna : str
+        Columnas que forman las filas y las columnas del heatmap
+    grupo : str, optional
+        Columna para ordenar las filas (p. ej. facultad): cada fila va con el
+        valor de `grupo` de la mayoría de sus registros y se ordenan por ese
+        valor y luego por etiqueta
+    empleo : str
+        Condición de empleo ('empleado' o 'activo')
+
+    Returns:
+    --------
+    dict
+        filas, columnas (pandas.Index, en orden de presentación) y graduados,
+        empleados (numpy int64, filas x columnas; 0 = celda sin graduados)
+    """
+    df = df.dropna(subset=[fila, columna])
+    df = df[df[claves.COL_ID] >= 0]
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+
+    cod_f, val_f = pd.factorize(df[fila], sort=True)
+    cod_c, val_c = pd.factorize(df[columna], sort=True)
+    n_f, n_c = len(val_f), len(val_c)
+
+    graduados, empleados = contar_personas(
+        ids,
+        cod_f.astype(np.int64) * n_c + cod_c,
+        n_f * n_c,
+        bandera_empleo(empleo, ids),
+    )
+    graduados = graduados.reshape(n_f, n_c)
+    empleados = empleados.reshape(n_f, n_c)
+
+    # Columnas ordenadas como texto
+    orden_c = np.argsort(np.asarray([str(v) for v in val_c]), kind="stable")
+
+    # Filas ordenadas por grupo (el de más registros; '' si no tiene) y etiqueta
+    orden_f = np.arange(n_f)
+    if grupo is not None and grupo in df.columns and n_f:
+        cod_g, val_g = pd.factorize(df[grupo], sort=True)
+        validas = cod_g >= 0
+        conteo = np.bincount(
+            cod_f[validas].astype(np.int64) * len(val_g) + cod_g[validas],
+            minlength=n_f * len(val_g),
+        ).reshape(n_f, len(val_g))
+        etiquetas = np.asarray([str(v) for v in val_g] + [""])
+        # argmax: en empate, el primer valor del grupo
+        principal = np.where(conteo.sum(axis=1) > 0, conteo.argmax(axis=1), -1)
+        orden_f = np.lexsort((orden_f, etiquetas[principal]))
+
+    return {
+        "filas": val_f.take(orden_f),
+        "columnas": val_c.take(orden_c),
+        "graduados": graduados[np.ix_(orden_f, orden_c)],
+        "empleados": empleados[np.ix_(orden_f, orden_c)],
+    }
+
+
+def top_n(matriz, n, min_graduados=1):
+    """
+    Filas con mayor tasa global (empleados / graduados de toda la fila),
+    entre las que suman al menos `min_graduados`. En empate de tasa queda
+    primero la fila que estaba antes.
+
+    Returns:
+    --------
+    numpy.ndarray
+        Posiciones de las filas elegidas, de mayor a menor tasa
+    """
+    suma_grad = matriz["graduados"].sum(axis=1)
+    suma_emp = matriz["empleados"].sum(axis=1)
+    candidatas = np.flatnonzero((suma_grad >= max(min_graduados, 1)) & (suma_grad > 0))
+    if candidatas.size == 0 or n <= 0:
+        return candidatas[:0]
+
+    tasa = suma_emp[candidatas] / suma_grad[candidatas] * 100
+    k = min(n, candidatas.size)
+    if k < candidatas.size:
+        # Tasa de la k-ésima mejor: entran las mayores y, del empate en el
+        # límite, las primeras
+        limite = tasa[np.argpartition(-tasa, k - 1)[k - 1]]
+        mayores = tasa > limite
+        empate = np.flatnonzero(tasa == limite)[: k - int(mayores.sum())]
+        mayores[empate] = True
+        candidatas, tasa = candidatas[mayores], tasa[mayores]
+
+    return candidatas[np.lexsort((candidatas, -tasa))]
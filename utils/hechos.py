@@ -0,0 +1,189 @@
+# utils/hechos.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from utils import claves
+from utils.datos import get_derived, get_table
+
+# Tabla de hechos por persona: una fila por cedula_id (la fila i es la persona
+# con cedula_id i), con los datos que las páginas derivaban de las tablas
+# crudas en cada rerun. Se arma por secciones, una por tabla de origen, para
+# que una página solo cargue las tablas cuyas columnas usa. Cada sección se
+# calcula una vez por versión de datos (get_derived).
+
+
+def _por_persona(df, col, n):
+    """Suma de `col` por cedula_id (0 para quien no tiene filas)."""
+    if df.empty or col not in df.columns:
+        return np.zeros(n)
+    sumas = df.dropna(subset=[col]).groupby(claves.COL_ID)[col].sum()
+    resultado = np.zeros(n)
+    resultado[sumas.index.to_numpy()] = sumas.to_numpy()
+    return resultado
+
+
+def _principal(ids, elegibles, ingreso, n):
+    """
+    Fila del empleo principal de cada cedula_id entre las filas elegibles: la
+    de mayor ingreso; en empate la primera de la tabla y los ingresos
+    faltantes al final (como sort mergesort + drop_duplicates). -1 si no hay.
+    """
+    filas = np.flatnonzero(elegibles & (ids >= 0))
+    orden = np.lexsort((filas, -np.nan_to_num(ingreso[filas], nan=-np.inf), ids[filas]))
+    filas = filas[orden]
+    primeras = np.ones(len(filas), dtype=bool)
+    primeras[1:] = ids[filas][1:] != ids[filas][:-1]
+    filas = filas[primeras]
+    principal = np.full(n, -1, dtype=np.int64)
+    principal[ids[filas]] = filas
+    return principal
+
+
+def _seccion_laboral():
+    df = get_table(
+        "DataLaboral",
+        columns=[claves.COL_ID, "labora_actualmente", "ingreso_aproximado"],
+    )
+    # Después de cargar: la tabla puede haber registrado cédulas nuevas
+    n = claves.total()
+    if df.empty:
+        df = pd.DataFrame({claves.COL_ID: pd.Series([], dtype="int32")})
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    if "labora_actualmente" in df.columns:
+        activo = df["labora_actualmente"].to_numpy(dtype=bool)
+    else:
+        activo = np.ones(len(df), dtype=bool)
+
+    empleos = np.bincount(ids[ids >= 0], minlength=n)
+    activos = np.bincount(ids[activo & (ids >= 0)], minlength=n)
+    return pd.DataFrame(
+        {
+            "empleado": empleos > 0,
+            "activo": activos > 0,
+            "ingresos": _por_persona(df, "ingreso_aproximado", n),
+        }
+    )
+
+
+def _seccion_inmuebles():
+    df = get_table("DataInmueble", columns=[claves.COL_ID, "valor_fiscal"])
+    n = claves.total()
+    return pd.DataFrame({"valor_inmueble": _por_persona(df, "valor_fiscal", n)})
+
+
+def _seccion_muebles():
+    df = get_table("DataMueble", columns=[claves.COL_ID, "valor_contrato"])
+    n = claves.total()
+    return pd.DataFrame({"valor_mueble": _por_persona(df, "valor_contrato", n)})
+
+
+def _seccion_localizacion():
+    df = get_table("DataLocalizacion", columns=[claves.COL_ID, "provincia_norm"])
+    n = claves.total()
+    provincia = pd.Series(pd.Categorical([np.nan] * n))
+    if "provincia_norm" in df.columns:
+        # Una provincia por persona: la primera registrada
+        df = df.dropna(subset=["provincia_norm"]).drop_duplicates(
+            subset=[claves.COL_ID]
+        )
+        codigos = np.full(n, -1, dtype=np.int64)
+        codigos[df[claves.COL_ID].to_numpy()] = df["provincia_norm"].cat.codes
+        provincia = pd.Series(
+            pd.Categorical.from_codes(
+                codigos, categories=df["provincia_norm"].cat.categories
+            )
+        )
+    return pd.DataFrame({"provincia_norm": provincia})
+
+
+# Sección -> (constructor, {columna: valor para personas sin datos})
+#   empleado          -> tiene algún registro en DataLaboral
+#   activo            -> tiene algún registro con labora_actualmente
+#   ingresos          -> suma de ingreso_aproximado de TODOS sus empleos
+#   valor_inmueble    -> suma de valor_fiscal en DataInmueble
+#   valor_mueble      -> suma de valor_contrato en DataMueble
+#   provincia_norm    -> provincia (primera registrada en DataLocalizacion)
+SECCIONES = {
+    "laboral": (
+        _seccion_laboral,
+        {
+            "empleado": False,
+            "activo": False,
+            "ingresos": 0.0,
+        },
+    ),
+    "inmuebles": (_seccion_inmuebles, {"valor_inmueble": 0.0}),
+    "muebles": (_seccion_muebles, {"valor_mueble": 0.0}),
+    "localizacion": (_seccion_localizacion, {"provincia_norm": np.nan}),
+}
+
+COLUMNAS = [col for _, defaults in SECCIONES.values() for col in defaults]
+
+
+def personas(columnas, cedula_ids=None):
+    """
+    Hechos por persona.
+
+    Parameters:
+    -----------
+    columnas : list of str
+        Columnas a incluir (ver COLUMNAS)
+    cedula_ids : array of int, optional
+        Personas a devolver, en ese orden (default: todas)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        cedula_id más las columnas pedidas, una fila por persona
+    """
+    if cedula_ids is None:
+        ids = np.arange(claves.total())
+    else:
+        ids = np.asarray(cedula_ids, dtype=np.int64)
+
+    partes = [pd.DataFrame({claves.COL_ID: ids.astype(np.int32)})]
+    for seccion, (construir, defaults) in SECCIONES.items():
+        cols = [c for c in columnas if c in defaults]
+        if not cols:
+            continue
+        df = get_derived(f"hechos:{seccion}", construir)[cols]
+        parte = df.reindex(ids)
+        # Personas registradas después de armar la sección: sin datos
+        if len(ids) and ids.max() >= len(df):
+            parte = parte.fillna({c: defaults[c] for c in cols}).astype(
+                df.dtypes.to_dict()
+            )
+        partes.append(parte.reset_index(drop=True))
+    return pd.concat(partes, axis=1)
+
+
+def _construir_principal(requiere):
+    columnas = [claves.COL_ID, "labora_actualmente", "ingreso_aproximado", requiere]
+    df = get_table("DataLaboral", columns=columnas)
+    n = claves.total()
+    if df.empty or requiere not in df.columns:
+        return np.full(n, -1, dtype=np.int64)
+    elegibles = df[requiere].notna().to_numpy()
+    if "labora_actualmente" in df.columns:
+        elegibles = elegibles & df["labora_actualmente"].to_numpy(dtype=bool)
+    if "ingreso_aproximado" in df.columns:
+        ingreso = df["ingreso_aproximado"].to_numpy(dtype="float64")
+    else:
+        ingreso = np.full(len(df), np.nan)
+    principal = _principal(
+        df[claves.COL_ID].to_numpy(dtype=np.int64), elegibles, ingreso, n
+    )
+    principal.flags.writeable = False
+    return principal
+
+
+def indice_principal(requiere):
+    """
+    Fila (posición en DataLaboral) del empleo principal de cada cedula_id
+    entre sus empleos activos con `requiere` no vacío; -1 si no tiene. Se
+    calcula una vez por versión de datos y es de solo lectura.
+    """
+    return get_derived(
+        f"hechos:empleo_principal:{requiere}", lambda: _construir_principal(requiere)
+    )
@@ -0,0 +1,169 @@
+# utils/metricas.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from utils import bitmaps, claves, cubo, hechos
+
+# Motor de métricas de empleo: graduados, empleados y no empleados únicos por
+# grupo, más la tasa. Reemplaza el patrón que repetían las páginas (filtrar
+# Graduados, filtrar DataLaboral, merge, dos groupby().nunique() y otro merge):
+# cada persona ya trae su condición de empleo en la tabla de hechos, así que
+# basta una pasada por las filas de Graduados para contar las dos cosas.
+
+COLUMNAS = ["total_graduados", "total_empleados", "total_no_empleados", "tasa"]
+
+# Condición de empleo -> medida del cubo
+_MEDIDAS_CUBO = {"empleado": "total_empleados", "activo": "total_activos"}
+
+
+def _con_tasa(df):
+    df["total_no_empleados"] = df["total_graduados"] - df["total_empleados"]
+    df["tasa"] = df["total_empleados"] / df["total_graduados"] * 100
+    return df
+
+
+def _codificar(col):
+    """Códigos (-1 si falta) y valores distintos en el orden de groupby."""
+    codigos, valores = pd.factorize(col, sort=True)
+    return codigos.astype(np.int64), valores
+
+
+def bandera_empleo(empleo, ids):
+    """Condición de empleo por cedula_id, al menos hasta el mayor de `ids`."""
+    if empleo not in _MEDIDAS_CUBO:
+        raise ValueError(f"Condición de empleo desconocida: {empleo}")
+    bandera = hechos.personas([empleo])[empleo].to_numpy(dtype=bool)
+    if len(ids) and ids.max() >= len(bandera):
+        bandera = np.pad(bandera, (0, int(ids.max()) + 1 - len(bandera)))
+    return bandera
+
+
+def contar_personas(ids, grupo, n_grupos, bandera):
+    """
+    Personas distintas y empleadas por grupo.
+
+    Parameters:
+    -----------
+    ids : array of int
+        cedula_id de cada fila (todas >= 0)
+    grupo : array of int
+        Grupo de cada fila, entre 0 y n_grupos - 1
+    n_grupos : int
+        Cantidad de grupos
+    bandera : array of bool
+        Condición de empleo por cedula_id (ver bandera_empleo)
+
+    Returns:
+    --------
+    tuple of numpy.ndarray
+        (graduados, empleados) por grupo, de largo n_grupos
+    """
+    n = int(ids.max()) + 1 if len(ids) else 1
+    pares = np.unique(np.asarray(grupo, dtype=np.int64) * n + ids)
+    grupo, personas = pares // n, pares % n
+    graduados = np.bincount(grupo, minlength=n_grupos)
+    empleados = np.bincount(
+        grupo, weights=bandera[personas], minlength=n_grupos
+    ).astype(np.int64)
+    return graduados, empleados
+
+
+def _agrupar(ids, bandera, codigos, por):
+    """Una agrupación sobre las filas: personas distintas y empleadas por grupo."""
+    validas = ids >= 0
+    clave = np.zeros(len(ids), dtype=np.int64)
+    for col in por:
+        cod, valores = codigos[col]
+        validas &= cod >= 0
+        clave = clave * len(valores) + cod
+
+    grupos, grupo = np.unique(clave[validas], return_inverse=True)
+    graduados, empleados = contar_personas(ids[validas], grupo, len(grupos), bandera)
+
+    res = pd.DataFrame(index=range(len(grupos)))
+    resto = grupos
+    for col in reversed(por):
+        _, valores = codigos[col]
+        res[col] = valores.take(resto % len(valores))
+        resto = resto // len(valores)
+    res = res[list(por)]
+    res["total_graduados"] = graduados
+    res["total_empleados"] = empleados
+    return _con_tasa(res)
+
+
+def _desde_filas(df, agrupaciones, empleo):
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    bandera = bandera_empleo(empleo, ids)
+    # Cada columna se codifica una sola vez para todas las agrupaciones
+    codigos = {col: _codificar(df[col]) for col in dict.fromkeys(sum(agrupaciones, []))}
+    return [_agrupar(ids, bandera, codigos, por) for por in agrupaciones]
+
+
+def _desde_mapas(filtros_sel, por, empleo):
+    res = bitmaps.conteo_graduados(
+        filtros_sel,
+        por=por[0] if por else None,
+        marcas={"total_empleados": bitmaps.laboral()[empleo]},
+    )
+    return _con_tasa(res.rename(columns={"personas": "total_graduados"}))
+
+
+def _desde_cubo(filtros_sel, agrupaciones, empleo):
+    # Filtros y a lo sumo una agrupación sobre Graduados: AND + popcount de
+    # los mapas de bits; lo demás (provincia, varias columnas) desde el cubo
+    dims = bitmaps.graduados()["dims"]
+    filtrados = [
+        col for col, valor in filtros_sel.items() if valor not in (None, "Todos")
+    ]
+    resultados = []
+    for por in agrupaciones:
+        if len(por) <= 1 and all(col in dims for col in filtrados + por):
+            resultados.append(_desde_mapas(filtros_sel, por, empleo))
+            continue
+        res = cubo.consultar(filtros_sel, por=por)
+        res = res[por + ["total_graduados", _MEDIDAS_CUBO[empleo]]]
+        res.columns = por + ["total_graduados", "total_empleados"]
+        resultados.append(_con_tasa(res))
+    return resultados
+
+
+def employment_rates(selection, by=(), empleo="empleado"):
+    """
+    Graduados, empleados y no empleados únicos por grupo, y la tasa de empleo.
+
+    Parameters:
+    -----------
+    selection : pandas.DataFrame or dict
+        Filas de Graduados ya filtradas (con cedula_id y las columnas de `by`),
+        o {columna: valor} de los filtros; en ese caso se responde desde los
+        mapas de bits (agrupando por a lo sumo una columna de Graduados) o
+        desde el cubo, y `by` solo puede usar cubo.DIMENSIONES
+    by : list of str, or list of lists of str
+        Columnas por las que agrupar ([] = total). Una lista de listas pide
+        varias agrupaciones en una sola llamada
+    empleo : str
+        'empleado' (algún registro en DataLaboral) o 'activo' (algún registro
+        con labora_actualmente)
+
+    Returns:
+    --------
+    pandas.DataFrame, or list of pandas.DataFrame
+        Una fila por grupo con al menos un graduado, ordenada por `by`, con
+        total_graduados, total_empleados, total_no_empleados y tasa (% sin
+        redondear). Una lista, en el mismo orden, si se pidieron varias
+        agrupaciones
+    """
+    if empleo not in _MEDIDAS_CUBO:
+        raise ValueError(f"Condición de empleo desconocida: {empleo}")
+
+    by = list(by)
+    varias = bool(by) and all(isinstance(b, (list, tuple)) for b in by)
+    agrupaciones = [list(b) for b in by] if varias else [by]
+
+    if isinstance(selection, pd.DataFrame):
+        resultados = _desde_filas(selection, agrupaciones, empleo)
+    else:
+        resultados = _desde_cubo(selection, agrupaciones, empleo)
+    return resultados if varias else resultados[0]
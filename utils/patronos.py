@@ -0,0 +1,309 @@
+# utils/patronos.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+# Canonización de nombres de patrono.
+#
+# Un mismo empleador llega escrito de varias formas ('CCSS', 'CAJA
+# COSTARRICENSE DE SEGURO SOCIAL', 'S.A.' / 'SOCIEDAD ANONIMA'...). Al cargar
+# DataLaboral cada nombre distinto se lleva a una clave (sin tildes ni
+# puntuación, con la forma jurídica escrita siempre igual y las siglas de
+# EQUIVALENCIAS expandidas) y las claves parecidas se agrupan:
+#
+# - La forma jurídica es parte del nombre: 'ACME SA' y 'ACME SRL' son
+#   entidades distintas y solo se comparan claves con la misma forma.
+# - Bloqueo por palabras: cada clave solo se compara con las que comparten
+#   alguna de sus BLOQUES_POR_NOMBRE palabras menos frecuentes, así que no se
+#   comparan todos contra todos.
+# - Similitud: Jaccard de las palabras ponderado por su rareza (IDF),
+#   calculado con arreglos para todos los pares candidatos de un lote.
+# - Los pares con similitud >= UMBRAL_SIMILITUD se unen (componentes
+#   conexas) y cada grupo toma como nombre canónico su nombre con más filas.
+#
+# Todo se hace sobre los nombres distintos, no sobre las filas.
+
+UMBRAL_SIMILITUD = 0.85
+BLOQUES_POR_NOMBRE = 2
+# Palabras en más nombres que esto no forman bloque (p. ej. 'COSTA', 'RICA')
+MAX_BLOQUE = 500
+# Palabras por nombre que se comparan
+MAX_PALABRAS = 16
+PARES_POR_LOTE = 50_000
+
+# Formas jurídicas escritas completas o con puntos -> una sola escritura, y
+# 'AND' / '&' -> 'Y'. Al cambiarlas hay que subir CACHE_FORMAT en
+# utils/excel_data.py.
+REEMPLAZOS = [
+    (r" AND ", " Y "),
+    (r" & ", " Y "),
+    (r" SOCIEDAD DE RESPONSABILIDAD LIMITADA ", " SRL "),
+    (r" SOCIEDAD ANONIMA ", " SA "),
+    (r" S A ", " SA "),
+    (r" S R L ", " SRL "),
+    (r" R L ", " RL "),
+    (r" LIMITADA ", " LTDA "),
+]
+
+# Siglas (o nombres) equivalentes, ya como clave: {clave: clave canónica}.
+# Son las únicas siglas que se unen a su nombre completo. Al cambiarlas hay
+# que subir CACHE_FORMAT en utils/excel_data.py.
+EQUIVALENCIAS = {
+    "CCSS": "CAJA COSTARRICENSE DE SEGURO SOCIAL",
+    "ICE": "INSTITUTO COSTARRICENSE DE ELECTRICIDAD",
+    "INS": "INSTITUTO NACIONAL DE SEGUROS",
+    "INA": "INSTITUTO NACIONAL DE APRENDIZAJE",
+    "MEP": "MINISTERIO DE EDUCACION PUBLICA",
+    "BCR": "BANCO DE COSTA RICA",
+    "BNCR": "BANCO NACIONAL DE COSTA RICA",
+    "UCR": "UNIVERSIDAD DE COSTA RICA",
+    "UNED": "UNIVERSIDAD ESTATAL A DISTANCIA",
+    "AYA": "INSTITUTO COSTARRICENSE DE ACUEDUCTOS Y ALCANTARILLADOS",
+}
+
+# Palabras que no cuentan para la similitud
+PALABRAS_VACIAS = {"DE", "DEL", "LA", "LAS", "LOS", "EL", "Y", "EN"}
+# Formas jurídicas (ya normalizadas por REEMPLAZOS) al final de la clave
+SUFIJOS = {"SA", "SRL", "LTDA", "RL"}
+
+
+def claves_nombre(nombres):
+    """
+    Clave de comparación de cada nombre: mayúsculas sin tildes, sin puntos,
+    solo letras y números, con las formas jurídicas escritas siempre igual
+    (REEMPLAZOS).
+    """
+    s = pd.Series(nombres, dtype=object).astype(str)
+    s = s.str.normalize("NFD").str.replace("[\u0300-\u036f]", "", regex=True)
+    s = s.str.upper().str.replace(".", "", regex=False)
+    s = s.str.replace("&", " & ", regex=False)
+    s = " " + s.str.replace(r"[^0-9A-Z&]+", " ", regex=True).str.strip() + " "
+    for patron, reemplazo in REEMPLAZOS:
+        s = s.str.replace(patron, reemplazo, regex=True)
+    return s.str.strip()
+
+
+def _siglas(claves):
+    """
+    Reemplaza las siglas de EQUIVALENCIAS por su clave completa. Devuelve
+    (claves, máscara de las reemplazadas).
+    """
+    reemplazadas = claves.isin(list(EQUIVALENCIAS)).to_numpy()
+    return claves.replace(EQUIVALENCIAS), reemplazadas
+
+
+def _forma_juridica(claves):
+    """Código de la forma jurídica al final de cada clave (-1 si no tiene)."""
+    patron = " (" + "|".join(sorted(SUFIJOS)) + ")$"
+    forma, _ = pd.factorize(claves.str.extract(patron, expand=False))
+    return forma
+
+
+def _palabras(claves):
+    """
+    Palabras de cada clave, sin las vacías: matriz (claves x hasta
+    MAX_PALABRAS) de códigos de palabra (-1 = vacío), peso IDF por palabra,
+    en cuántas claves está cada palabra, peso total y forma jurídica de cada
+    clave.
+    """
+    partes = claves.str.split().explode()
+    partes = partes[partes.notna()]
+    partes = partes[~partes.isin(PALABRAS_VACIAS)]
+    fila = partes.index.to_numpy(dtype=np.int64)
+    palabra, _ = pd.factorize(partes, sort=False)
+    n_palabras = int(palabra.max()) + 1 if len(palabra) else 0
+
+    # Una vez por clave y en el orden en que aparecen
+    pares = pd.DataFrame({"fila": fila, "palabra": palabra}).drop_duplicates()
+    fila, palabra = pares["fila"].to_numpy(), pares["palabra"].to_numpy()
+    frecuencia = np.bincount(palabra, minlength=n_palabras)
+    peso = np.log1p(len(claves) / np.maximum(frecuencia, 1))
+
+    inicio = np.searchsorted(fila, np.arange(len(claves)))
+    posicion = np.arange(len(fila)) - inicio[fila]
+    dentro = posicion < MAX_PALABRAS
+    ancho = int(posicion[dentro].max()) + 1 if dentro.any() else 1
+    matriz = np.full((len(claves), ancho), -1, dtype=np.int64)
+    matriz[fila[dentro], posicion[dentro]] = palabra[dentro]
+    total = np.where(matriz >= 0, peso[np.maximum(matriz, 0)], 0.0).sum(axis=1)
+    return {
+        "matriz": matriz,
+        "peso": peso,
+        "frecuencia": frecuencia,
+        "total": total,
+        "forma": _forma_juridica(claves),
+    }
+
+
+def _candidatos(palabras):
+    """
+    Pares (i < j) de claves que comparten alguna de sus BLOQUES_POR_NOMBRE
+    palabras menos frecuentes (palabras en 2..MAX_BLOQUE claves), con la
+    misma forma jurídica y cuyos pesos totales permiten llegar a
+    UMBRAL_SIMILITUD.
+    """
+    matriz = palabras["matriz"]
+    frec = np.where(
+        matriz >= 0,
+        palabras["frecuencia"][np.maximum(matriz, 0)],
+        np.iinfo(np.int64).max,
+    )
+    orden = np.argsort(frec, axis=1, kind="stable")[:, :BLOQUES_POR_NOMBRE]
+    bloque = np.take_along_axis(matriz, orden, axis=1)
+    frec = np.take_along_axis(frec, orden, axis=1)
+    clave = np.broadcast_to(np.arange(len(matriz))[:, None], bloque.shape)
+    validos = (frec >= 2) & (frec <= MAX_BLOQUE)
+    bloque, clave = bloque[validos], clave[validos]
+
+    # Todos los pares dentro de cada bloque, sin bucle en Python
+    orden = np.lexsort((clave, bloque))
+    bloque, clave = bloque[orden], clave[orden]
+    fin = np.searchsorted(bloque, bloque, side="right")
+    siguientes = fin - np.arange(len(bloque)) - 1
+    i = np.repeat(np.arange(len(bloque)), siguientes)
+    desde = np.repeat(np.cumsum(siguientes) - siguientes, siguientes)
+    i, j = clave[i], clave[i + 1 + np.arange(len(i)) - desde]
+
+    # El Jaccard no pasa de peso menor / peso mayor
+    total, forma = palabras["total"], palabras["forma"]
+    posibles = np.minimum(total[i], total[j]) >= UMBRAL_SIMILITUD * np.maximum(
+        total[i], total[j]
+    )
+    posibles &= forma[i] == forma[j]
+    pares = np.sort(i[posibles] * len(matriz) + j[posibles])
+    pares = pares[np.r_[True, pares[1:] != pares[:-1]]] if len(pares) else pares
+    return pares // len(matriz), pares % len(matriz)
+
+
+def _similitud(palabras, i, j):
+    """Jaccard ponderado por IDF entre las palabras de las claves i y j."""
+    matriz, peso, total = palabras["matriz"], palabras["peso"], palabras["total"]
+    largo = (matriz >= 0).sum(axis=1)
+    # Lotes de pares con cantidades de palabras parecidas: cada lote compara
+    # solo las columnas que usa
+    orden = np.lexsort((largo[j], largo[i]))
+    resultado = np.zeros(len(i))
+    for desde in range(0, len(i), PARES_POR_LOTE):
+        lote = orden[desde : desde + PARES_POR_LOTE]
+        lote_i, lote_j = i[lote], j[lote]
+        a = matriz[lote_i, : largo[lote_i].max()]
+        b = matriz[lote_j, : largo[lote_j].max()]
+        comun = ((a[:, :, None] == b[:, None, :]) & (a[:, :, None] >= 0)).any(axis=2)
+        interseccion = np.where(comun, peso[np.maximum(a, 0)], 0.0).sum(axis=1)
+        union = total[lote_i] + total[lote_j] - interseccion
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resultado[lote] = np.where(union > 0, interseccion / union, 0.0)
+    return resultado
+
+
+def _componentes(n, i, j):
+    """Componente conexa (menor índice del grupo) de cada nodo."""
+    grupo = np.arange(n)
+    while True:
+        menor = np.minimum(grupo[i], grupo[j])
+        nuevo = grupo.copy()
+        np.minimum.at(nuevo, i, menor)
+        np.minimum.at(nuevo, j, menor)
+        nuevo = nuevo[nuevo]  # salto de punteros
+        if np.array_equal(nuevo, grupo):
+            return grupo
+        grupo = nuevo
+
+
+def canonizar(nombres, filas):
+    """
+    Agrupa los nombres de patrono que corresponden al mismo empleador.
+
+    Parameters:
+    -----------
+    nombres : sequence of str
+        Nombres distintos (sin faltantes)
+    filas : array of int
+        Filas de cada nombre (el canónico de cada grupo es el de más filas)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Tabla de equivalencias, una fila por nombre: nombre_patrono, clave,
+        patrono_id (int32, en el orden alfabético de los canónicos),
+        nombre_canonico y filas
+    """
+    nombres = pd.Series(nombres, dtype=object).reset_index(drop=True)
+    filas = np.asarray(filas, dtype=np.int64)
+    clave, _ = _siglas(claves_nombre(nombres))
+
+    # Desde aquí se trabaja con las claves distintas
+    de_clave, claves = pd.factorize(clave, sort=True)
+    claves = pd.Series(claves, dtype=object)
+    palabras = _palabras(claves)
+    i, j = _candidatos(palabras)
+    unidos = _similitud(palabras, i, j) >= UMBRAL_SIMILITUD
+    grupo = _componentes(len(claves), i[unidos], j[unidos])[de_clave]
+
+    # Canónico: el nombre con más filas del grupo (en empate, el más corto y
+    # luego el primero alfabéticamente)
+    largo = nombres.str.len().to_numpy()
+    orden = np.lexsort((nombres.to_numpy(), largo, -filas, grupo))
+    primeros = np.ones(len(orden), dtype=bool)
+    primeros[1:] = grupo[orden][1:] != grupo[orden][:-1]
+    canonico_de = np.empty(int(grupo.max()) + 1 if len(grupo) else 0, dtype=np.int64)
+    canonico_de[grupo[orden][primeros]] = orden[primeros]
+    canonico = canonico_de[grupo]
+
+    # patrono_id denso, en el orden alfabético de los nombres canónicos
+    _, patrono_id = np.unique(nombres.to_numpy()[canonico], return_inverse=True)
+
+    return pd.DataFrame(
+        {
+            "nombre_patrono": nombres,
+            "clave": clave.to_numpy(),
+            "patrono_id": patrono_id.astype(np.int32),
+            "nombre_canonico": nombres.to_numpy()[canonico],
+            "filas": filas,
+        }
+    )
+
+
+def tabla_patronos(df_lab):
+    """
+    Nombres de patrono que se unieron a otro al cargar DataLaboral, para
+    revisarlos. Sale de las columnas guardadas en la carga (nombre_patrono,
+    patrono_id y nombre_patrono_canonico), sin volver a canonizar.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Una fila por nombre de los grupos con más de un nombre:
+        nombre_canonico, nombre_patrono, patrono_id, filas y regla
+        ('canonico', 'sigla', 'clave' o 'similitud': por qué se unió)
+    """
+    nombre = df_lab["nombre_patrono"].astype("category")
+    codigos = nombre.cat.codes.to_numpy()
+    presentes = codigos >= 0
+    filas = np.bincount(codigos[presentes], minlength=len(nombre.cat.categories))
+    # Todas las filas de un nombre tienen el mismo patrono_id
+    patrono_id = np.full(len(filas), -1, dtype=np.int64)
+    patrono_id[codigos[presentes]] = df_lab["patrono_id"].to_numpy()[presentes]
+    canonicos = df_lab["nombre_patrono_canonico"].cat.categories
+
+    con_filas = filas > 0
+    tabla = pd.DataFrame(
+        {
+            "nombre_patrono": nombre.cat.categories[con_filas],
+            "patrono_id": patrono_id[con_filas].astype(np.int32),
+            "filas": filas[con_filas],
+        }
+    )
+    tabla["nombre_canonico"] = canonicos[tabla["patrono_id"].to_numpy()]
+    tabla = tabla[tabla["patrono_id"].duplicated(keep=False)].reset_index(drop=True)
+
+    # Regla de cada unión (solo sobre los nombres unidos, que son pocos)
+    clave, por_sigla = _siglas(claves_nombre(tabla["nombre_patrono"]))
+    clave_canonica, _ = _siglas(claves_nombre(tabla["nombre_canonico"]))
+    regla = np.where(
+        por_sigla, "sigla", np.where(clave == clave_canonica, "clave", "similitud")
+    )
+    tabla["regla"] = np.where(
+        tabla["nombre_patrono"] == tabla["nombre_canonico"], "canonico", regla
+    )
+    return tabla[["nombre_canonico", "nombre_patrono", "patrono_id", "filas", "regla"]]
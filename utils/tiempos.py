@@ -0,0 +1,269 @@
+# utils/tiempos.py
+from __future__ import annotations
+import re
+import numpy as np
+import pandas as pd
+
+from utils import claves
+from utils.datos import get_derived, get_table
+
+# Tiempo al primer empleo para todas las cohortes a la vez.
+#
+# Las fechas se manejan como meses enteros (año * 12 + mes - 1): la fecha de
+# inicio de un empleo es el mes del corte menos su antigüedad y el retraso es
+# una resta de enteros, sin un DateOffset por fila. Todas las fechas son el
+# día 1 del mes, así que no hay ajuste por día.
+
+# Fecha de extracción de DataLaboral
+FECHA_SNAPSHOT = "2025-04-01"
+
+# Fecha de graduación por cohorte: {anio_graduacion o cod_graduacion: fecha}.
+# Las cohortes que no están aquí usan su cod_graduacion, 'AAAA-P' (año y
+# periodo de graduación del año, no un mes), con el mes de MES_POR_PERIODO
+# si el periodo está ahí y el año coincide con anio_graduacion; si no,
+# MES_GRADUACION de su anio_graduacion.
+FECHAS_GRADUACION = {}
+MES_POR_PERIODO = {}
+MES_GRADUACION = 3
+
+_CODIGO_PERIODO = re.compile(r"^(\d{4})-(\d)$")
+
+
+def a_meses(fecha):
+    """Fecha (o texto de fecha) -> meses enteros año * 12 + mes - 1."""
+    fecha = pd.Timestamp(fecha)
+    return fecha.year * 12 + fecha.month - 1
+
+
+def de_meses(meses):
+    """Meses enteros -> fechas (día 1); NaT donde meses es negativo."""
+    meses = np.asarray(meses, dtype=np.int64)
+    validos = meses >= 0
+    anio = np.where(validos, meses // 12, 1970)
+    mes = np.where(validos, meses % 12 + 1, 1)
+    fechas = pd.to_datetime(pd.DataFrame({"year": anio, "month": mes, "day": 1}))
+    return fechas.where(validos)
+
+
+def _mes_de_codigo(valores, anios):
+    """Mes de graduación de cada valor distinto (anios: su anio_graduacion)."""
+    meses = np.full(len(valores), -1, dtype=np.int64)
+    for i, (valor, anio) in enumerate(zip(valores, anios)):
+        fecha = FECHAS_GRADUACION.get(valor) or FECHAS_GRADUACION.get(anio)
+        if fecha is not None:
+            meses[i] = a_meses(fecha)
+            continue
+        partes = _CODIGO_PERIODO.match(valor)
+        mes = MES_POR_PERIODO.get(int(partes.group(2))) if partes else None
+        if mes is not None and 1 <= mes <= 12 and partes.group(1) == str(anio):
+            meses[i] = int(anio) * 12 + mes - 1
+        elif str(anio).isdigit():
+            meses[i] = int(anio) * 12 + MES_GRADUACION - 1
+    return meses
+
+
+def meses_graduacion(df_grad):
+    """Mes de graduación (meses enteros, -1 si no se puede saber) por fila."""
+    anio = (
+        df_grad["anio_graduacion"]
+        .astype(str)
+        .where(df_grad["anio_graduacion"].notna(), "")
+    )
+    if "cod_graduacion" in df_grad.columns:
+        codigo = (
+            df_grad["cod_graduacion"]
+            .astype(str)
+            .where(df_grad["cod_graduacion"].notna(), "")
+        )
+    else:
+        codigo = pd.Series("", index=df_grad.index)
+    # Una vez por combinación distinta, no por fila
+    combinaciones, valores = pd.factorize(
+        pd.MultiIndex.from_arrays([codigo, anio]), sort=False
+    )
+    meses = _mes_de_codigo(valores.get_level_values(0), valores.get_level_values(1))
+    return meses[combinaciones]
+
+
+def _construir_empleos():
+    """Empleos vigentes con antigüedad, ordenados por (cedula_id, inicio)."""
+    df = get_table(
+        "DataLaboral",
+        columns=[claves.COL_ID, "labora_actualmente", "antiguedad_meses"],
+    )
+    if "antiguedad_meses" not in df.columns:
+        return None
+    if "labora_actualmente" in df.columns:
+        df = df[df["labora_actualmente"]]
+    df = df.dropna(subset=["antiguedad_meses"])
+    df = df[df[claves.COL_ID] >= 0]
+
+    ids = df[claves.COL_ID].to_numpy(dtype=np.int64)
+    antiguedad = np.clip(df["antiguedad_meses"].to_numpy().astype(np.int64), 0, None)
+    inicio = a_meses(FECHA_SNAPSHOT) - antiguedad
+    orden = np.lexsort((inicio, ids))
+    return {"ids": ids[orden], "inicio": inicio[orden]}
+
+
+def empleos():
+    """{"ids", "inicio"} de los empleos vigentes (None sin antiguedad_meses)."""
+    return get_derived("tiempos:empleos", _construir_empleos)
+
+
+def _pares(df_grad, grupo):
+    """
+    Una fila por (grupo, persona) con su graduación más temprana.
+    Devuelve (ids, graduacion, grupo), ordenados por grupo y persona.
+    """
+    ids = df_grad[claves.COL_ID].to_numpy(dtype=np.int64)
+    graduacion = meses_graduacion(df_grad)
+    validas = (ids >= 0) & (graduacion >= 0) & (grupo >= 0)
+    ids, graduacion, grupo = ids[validas], graduacion[validas], grupo[validas]
+
+    orden = np.lexsort((graduacion, ids, grupo))
+    ids, graduacion, grupo = ids[orden], graduacion[orden], grupo[orden]
+    primeras = np.ones(len(ids), dtype=bool)
+    primeras[1:] = (ids[1:] != ids[:-1]) | (grupo[1:] != grupo[:-1])
+    return ids[primeras], graduacion[primeras], grupo[primeras]
+
+
+def _primer_inicio(trabajos, ids, desde):
+    """
+    Inicio del primer empleo de cada persona que empieza en o después de
+    `desde` (-1 si no tiene), por búsqueda binaria sobre la clave
+    (persona, inicio) de los empleos ordenados.
+    """
+    base = int(max(trabajos["inicio"].max(initial=0), desde.max(initial=0))) + 1
+    claves_empleo = trabajos["ids"] * base + trabajos["inicio"]
+    pos = np.searchsorted(claves_empleo, ids * base + desde, side="left")
+    dentro = pos < len(claves_empleo)
+    encontrado = np.zeros(len(ids), dtype=bool)
+    encontrado[dentro] = trabajos["ids"][pos[dentro]] == ids[dentro]
+    inicio = np.full(len(ids), -1, dtype=np.int64)
+    inicio[encontrado] = trabajos["inicio"][pos[encontrado]]
+    return inicio
+
+
+def tiempo_primer_empleo(df_grad):
+    """
+    Meses desde la graduación al primer empleo vigente que empieza en o
+    después de ella, para cada persona de cada cohorte.
+
+    Parameters:
+    -----------
+    df_grad : pandas.DataFrame
+        Filas de Graduados ya filtradas (cedula_id, anio_graduacion y,
+        si existe, cod_graduacion)
+
+    Returns:
+    --------
+    pandas.DataFrame or None
+        Una fila por (anio_graduacion, cedula_id) con fecha_graduacion,
+        fecha_inicio_empleo (NaT sin empleo posterior),
+        meses_al_primer_empleo (NaN sin empleo posterior) y meses_observados
+        (de la graduación al corte). None si DataLaboral no tiene
+        antiguedad_meses.
+    """
+    trabajos = empleos()
+    if trabajos is None:
+        return None
+
+    cohorte, cohortes = pd.factorize(df_grad["anio_graduacion"], sort=True)
+    ids, graduacion, cohorte = _pares(df_grad, cohorte)
+    inicio = _primer_inicio(trabajos, ids, graduacion)
+    encontrado = inicio >= 0
+
+    return pd.DataFrame(
+        {
+            "anio_graduacion": cohortes.take(cohorte),
+            claves.COL_ID: ids.astype(np.int32),
+            "fecha_graduacion": de_meses(graduacion).to_numpy(),
+            "fecha_inicio_empleo": de_meses(inicio).to_numpy(),
+            "meses_al_primer_empleo": np.where(encontrado, inicio - graduacion, np.nan),
+            "meses_observados": a_meses(FECHA_SNAPSHOT) - graduacion,
+        }
+    )
+
+
+def curvas_supervivencia(df_grad, por=None, horizonte=24):
+    """
+    Curvas de Kaplan-Meier del tiempo al primer empleo, para todos los
+    grupos en una sola pasada.
+
+    Cada (grupo, persona) aporta un evento en el mes de su primer empleo
+    posterior a la graduación; quien ya trabajaba desde antes de graduarse
+    (y sigue en ese empleo) cuenta como empleado en el mes 0. Quien no tiene
+    empleo vigente queda censurado en los meses observados hasta el corte.
+    Eventos y salidas se cuentan con un bincount sobre grupo x mes y el
+    riesgo y la supervivencia salen de sumas y productos acumulados.
+
+    Parameters:
+    -----------
+    df_grad : pandas.DataFrame
+        Filas de Graduados ya filtradas
+    por : str, optional
+        Columna de df_grad que define los grupos (default: un solo grupo)
+    horizonte : int
+        Último mes de la curva
+
+    Returns:
+    --------
+    pandas.DataFrame or None
+        Una fila por grupo y mes (0..horizonte) con personas, en_riesgo,
+        eventos, censurados y pct_empleados (1 - S(t), en %). None si
+        DataLaboral no tiene antiguedad_meses.
+    """
+    trabajos = empleos()
+    if trabajos is None:
+        return None
+
+    if por is None:
+        grupo = np.zeros(len(df_grad), dtype=np.int64)
+        grupos = pd.Index(["Todos"])
+        por = "grupo"
+    else:
+        grupo, grupos = pd.factorize(df_grad[por], sort=True)
+    ids, graduacion, grupo = _pares(df_grad, grupo)
+
+    observados = a_meses(FECHA_SNAPSHOT) - graduacion
+    validos = observados >= 0  # graduados después del corte: sin datos
+    ids, graduacion, grupo = ids[validos], graduacion[validos], grupo[validos]
+    observados = observados[validos]
+
+    inicio = _primer_inicio(trabajos, ids, graduacion)
+    primero = _primer_inicio(trabajos, ids, np.zeros_like(graduacion))
+    con_empleo = primero >= 0
+    # Si el primer empleo empezó antes de graduarse, el evento es el mes 0
+    # aunque después haya empleos nuevos
+    antes = con_empleo & (primero < graduacion)
+    duracion = np.where(antes | (inicio < 0), 0, inicio - graduacion)
+    duracion = np.where(con_empleo, duracion, observados)
+
+    # Lo que pasa después del horizonte queda censurado en el horizonte
+    evento = con_empleo & (duracion <= horizonte)
+    duracion = np.minimum(duracion, horizonte)
+
+    n_grupos, n_meses = len(grupos), horizonte + 1
+    celda = grupo.astype(np.int64) * n_meses + duracion
+    eventos = np.bincount(celda[evento], minlength=n_grupos * n_meses)
+    salidas = np.bincount(celda, minlength=n_grupos * n_meses)
+    eventos = eventos.reshape(n_grupos, n_meses)
+    salidas = salidas.reshape(n_grupos, n_meses)
+
+    personas = salidas.sum(axis=1, keepdims=True)
+    en_riesgo = personas - np.cumsum(salidas, axis=1) + salidas
+    with np.errstate(divide="ignore", invalid="ignore"):
+        riesgo = np.where(en_riesgo > 0, eventos / en_riesgo, 0.0)
+    supervivencia = np.cumprod(1 - riesgo, axis=1)
+
+    return pd.DataFrame(
+        {
+            por: grupos.take(np.repeat(np.arange(n_grupos), n_meses)),
+            "mes": np.tile(np.arange(n_meses), n_grupos),
+            "personas": np.repeat(personas[:, 0], n_meses),
+            "en_riesgo": en_riesgo.ravel(),
+            "eventos": eventos.ravel(),
+            "censurados": (salidas - eventos).ravel(),
+            "pct_empleados": ((1 - supervivencia) * 100).ravel(),
+        }
+    )
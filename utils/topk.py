@@ -0,0 +1,295 @@
+# utils/topk.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from utils import claves, filtros, hechos
+from utils.datos import get_derived, get_table
+
+# Resúmenes Top-K por celda para los rankings de empleadores y actividades.
+#
+# Una celda es una combinación (universidad, grado, facultad, carrera, año).
+# El resumen de cada celda guarda los K_RESUMEN valores con más personas
+# (según su empleo principal, ver hechos.indice_principal) con su conteo
+# exacto, cuántas personas tiene la celda y una cota para el resto: ningún
+# valor que no esté en el resumen tiene más personas que esa cota. Una
+# selección de filtros se responde sumando los resúmenes de sus celdas, que
+# son pocos y chicos, sin recorrer los empleos.
+#
+# Las personas se cuentan una vez aunque tengan títulos en varias celdas: los
+# resúmenes solo incluyen a quienes tienen una única celda y las pocas
+# personas con varias se suman aparte, exactamente, en cada consulta.
+#
+# Con las cotas se verifica que el Top K combinado sea exacto; si no se puede
+# asegurar (o la selección filtra por énfasis o periodo, que no son
+# dimensiones de las celdas) se cuenta directamente sobre las personas
+# filtradas.
+
+DIMENSIONES = ["universidad", "grado", "facultad", "carrera", "anio_graduacion"]
+K_RESUMEN = 128
+
+
+def _construir(columna, subcolumna):
+    df_grad = get_table("Graduados")
+    indice, _ = filtros.obtener_indice(df_grad)
+    ids = df_grad[claves.COL_ID].to_numpy(dtype=np.int64)
+
+    # Celda de cada fila: código denso de la combinación de dimensiones. Un
+    # valor faltante tiene su propio código (código + 1, 0 = faltante) para
+    # que esas filas cuenten cuando el filtro de la dimensión es "Todos"
+    clave = np.zeros(len(ids), dtype=np.int64)
+    validas = ids >= 0
+    for col in DIMENSIONES:
+        dim = indice["dims"][col]
+        clave = clave * (len(dim["valores"]) + 1) + dim["codigos"] + 1
+    celdas, celda = np.unique(clave[validas], return_inverse=True)
+    n_celdas = len(celdas)
+
+    # Código de cada dimensión por celda, -1 si falta (para elegir celdas
+    # por filtros)
+    codigos_celda = {}
+    resto = celdas
+    for col in reversed(DIMENSIONES):
+        k = len(indice["dims"][col]["valores"]) + 1
+        codigos_celda[col] = resto % k - 1
+        resto = resto // k
+
+    # (celda, persona) distintos y cuántas celdas tiene cada persona
+    df_lab = get_table(
+        "DataLaboral", columns=[c for c in (columna, subcolumna) if c is not None]
+    )
+    puntero = hechos.indice_principal(columna)
+    n = max(claves.total(), len(puntero))
+    pares = np.unique(celda.astype(np.int64) * n + ids[validas])
+    celda, persona = pares // n, pares % n
+    unica = np.bincount(persona, minlength=n)[persona] == 1
+
+    # Valor (y subvalor) del empleo principal de cada persona, -1 sin empleo
+    valores = df_lab[columna].astype("category")
+    tiene = np.flatnonzero(puntero >= 0)
+    valor = np.full(n, -1, dtype=np.int64)
+    valor[tiene] = valores.cat.codes.to_numpy()[puntero[tiene]]
+    subvalores = subvalor = None
+    if subcolumna is not None and subcolumna in df_lab.columns:
+        subvalores = df_lab[subcolumna].astype("category")
+        subvalor = np.full(n, -1, dtype=np.int64)
+        subvalor[tiene] = subvalores.cat.codes.to_numpy()[puntero[tiene]]
+
+    # Conteos (celda, valor) de las personas con una sola celda
+    c_u, p_u = celda[unica], persona[unica]
+    v_u = valor[p_u]
+    con_valor = v_u >= 0
+    c_u, p_u, v_u = c_u[con_valor], p_u[con_valor], v_u[con_valor]
+    n_valores = len(valores.cat.categories)
+    entradas, conteos = np.unique(c_u * n_valores + v_u, return_counts=True)
+    e_celda, e_valor = entradas // n_valores, entradas % n_valores
+
+    # Top K_RESUMEN de cada celda: orden (celda, -conteo, valor) y rango
+    orden = np.lexsort((e_valor, -conteos, e_celda))
+    e_celda, e_valor, conteos = e_celda[orden], e_valor[orden], conteos[orden]
+    inicios = np.searchsorted(e_celda, np.arange(n_celdas + 1))
+    guardadas = np.arange(len(e_celda)) - inicios[e_celda] < K_RESUMEN
+    cota = np.zeros(n_celdas, dtype=np.int64)
+    np.maximum.at(cota, e_celda[~guardadas], conteos[~guardadas])
+
+    resumen = {
+        "celda": e_celda[guardadas],
+        "valor": e_valor[guardadas],
+        "conteo": conteos[guardadas],
+        "inicios": np.searchsorted(e_celda[guardadas], np.arange(n_celdas + 1)),
+        "cota": cota,
+        "personas": np.bincount(c_u, minlength=n_celdas),
+    }
+    if subvalor is not None:
+        s_u = subvalor[p_u]
+        con_sub = s_u >= 0
+        n_sub = len(subvalores.cat.categories)
+        claves_sub = (c_u[con_sub] * n_valores + v_u[con_sub]) * n_sub + s_u[con_sub]
+        resumen["sub_claves"], resumen["sub_conteos"] = np.unique(
+            claves_sub, return_counts=True
+        )
+
+    return {
+        "dims": {col: indice["dims"][col]["codigo_de"] for col in DIMENSIONES},
+        "codigos_celda": codigos_celda,
+        "n_celdas": n_celdas,
+        "valores": valores.dtype,
+        "subvalores": None if subvalores is None else subvalores.dtype,
+        "valor": valor,
+        "subvalor": subvalor,
+        "resumen": resumen,
+        # Personas con varias celdas: sus pares, para contarlas aparte
+        "varias": {"celda": celda[~unica], "persona": persona[~unica]},
+    }
+
+
+def resumenes(columna, subcolumna=None):
+    """Resúmenes Top-K de `columna` por celda (una vez por versión de datos)."""
+    return get_derived(
+        f"topk:{columna}:{subcolumna}", lambda: _construir(columna, subcolumna)
+    )
+
+
+def _celdas(datos, selections):
+    """Máscara de celdas de la selección, o None si no se puede responder."""
+    mascara = np.ones(datos["n_celdas"], dtype=bool)
+    for label, col in filtros.ORDER:
+        valor = selections.get(label)
+        if valor is None or valor == "Todos":
+            continue
+        if col not in DIMENSIONES:
+            return None
+        codigo = datos["dims"][col].get(str(valor))
+        if codigo is None:
+            # Valor que no aparece en los datos: ninguna celda
+            mascara[:] = False
+            continue
+        mascara &= datos["codigos_celda"][col] == codigo
+    return mascara
+
+
+def _entradas(inicios, celdas):
+    """Posiciones de las entradas del resumen de esas celdas."""
+    desde = inicios[celdas]
+    largos = inicios[celdas + 1] - desde
+    # Rangos [desde, desde + largo) concatenados sin bucle en Python
+    saltos = np.repeat(desde - np.cumsum(largos) + largos, largos)
+    return saltos + np.arange(int(largos.sum()))
+
+
+def _desde_resumenes(datos, mascara, excluidos):
+    """
+    Conteos por valor en las celdas de `mascara` y si son exactos para el
+    Top K (ver top_k). Devuelve (inferior, superior, total, sub), donde sub
+    cuenta (valor, subvalor) para una lista de valores.
+    """
+    resumen = datos["resumen"]
+    n_valores = len(excluidos)
+    seleccion = np.flatnonzero(mascara)
+    entradas = _entradas(resumen["inicios"], seleccion)
+    valor = resumen["valor"][entradas]
+    inferior = np.bincount(
+        valor, weights=resumen["conteo"][entradas], minlength=n_valores
+    )
+
+    # Un valor sin entrada en una celda puede tener ahí hasta la cota
+    cotas = resumen["cota"][seleccion]
+    superior = inferior + cotas.sum()
+    superior -= np.bincount(
+        valor, weights=resumen["cota"][resumen["celda"][entradas]], minlength=n_valores
+    )
+
+    # Personas con varias celdas: una vez si alguna está en la selección
+    varias = datos["varias"]
+    personas = np.unique(varias["persona"][mascara[varias["celda"]]])
+    personas = personas[datos["valor"][personas] >= 0]
+    extra = np.bincount(datos["valor"][personas], minlength=n_valores)
+    total = int(resumen["personas"][seleccion].sum()) + len(personas)
+
+    def sub(elegidos):
+        n_sub = len(datos["subvalores"].categories)
+        extra_sub = _sub_de_personas(datos, personas, elegidos)
+        if not len(resumen["sub_claves"]):
+            return extra_sub
+        celda_valor = seleccion[:, None] * n_valores + elegidos[None, :]
+        buscadas = celda_valor[..., None] * n_sub + np.arange(n_sub)
+        pos = np.searchsorted(resumen["sub_claves"], buscadas)
+        pos = np.minimum(pos, len(resumen["sub_claves"]) - 1)
+        encontradas = resumen["sub_claves"][pos] == buscadas
+        conteos = np.where(encontradas, resumen["sub_conteos"][pos], 0).sum(axis=0)
+        return conteos + extra_sub
+
+    inferior = np.where(excluidos, 0, inferior + extra).astype(np.int64)
+    superior = np.where(excluidos, 0, superior + extra).astype(np.int64)
+    return inferior, superior, total, sub
+
+
+def _sub_de_personas(datos, personas, elegidos):
+    """Conteos (valor elegido, subvalor) de esas personas."""
+    n_sub = len(datos["subvalores"].categories)
+    posicion = np.full(len(datos["valores"].categories), -1, dtype=np.int64)
+    posicion[elegidos] = np.arange(len(elegidos))
+    fila = posicion[datos["valor"][personas]]
+    columna = datos["subvalor"][personas]
+    validas = (fila >= 0) & (columna >= 0)
+    return np.bincount(
+        fila[validas] * n_sub + columna[validas], minlength=len(elegidos) * n_sub
+    ).reshape(len(elegidos), n_sub)
+
+
+def _limite(conteos, k):
+    """Conteo del k-ésimo valor (0 si hay menos de k con personas)."""
+    positivos = conteos[conteos > 0]
+    if k <= 0 or positivos.size < k:
+        return 0
+    return int(np.partition(positivos, positivos.size - k)[positivos.size - k])
+
+
+def top_k(columna, selections, cedula_ids, k=10, subcolumna=None, excluir=()):
+    """
+    Los k valores de `columna` con más personas (por su empleo principal)
+    entre las personas filtradas, con los empates en el puesto k incluidos.
+
+    Parameters:
+    -----------
+    columna : str
+        Columna de DataLaboral a rankear (p. ej. 'nombre_patrono')
+    selections : dict
+        {EtiquetaFiltro: valor}, como lo devuelve filtros_locales
+    cedula_ids : array of int
+        Personas filtradas (para contar directamente si hace falta)
+    k : int
+        Cantidad de valores
+    subcolumna : str, optional
+        Columna de DataLaboral de la que se informa el valor más frecuente
+        entre las personas de cada valor (en empate, el primero)
+    excluir : iterable
+        Valores de `columna` que no entran en el ranking
+
+    Returns:
+    --------
+    tuple
+        (DataFrame con `columna`, personas y, si se pidió, `subcolumna`, en
+        el orden de las categorías; personas filtradas con un empleo así)
+    """
+    datos = resumenes(columna, subcolumna)
+    excluidos = np.isin(datos["valores"].categories, list(excluir))
+
+    conteos = None
+    mascara = _celdas(datos, selections)
+    if mascara is not None:
+        inferior, superior, total, sub = _desde_resumenes(datos, mascara, excluidos)
+        # Exacto si todo valor que podría llegar al k-ésimo conteo tiene su
+        # conteo completo (ninguna celda lo dejó fuera de su resumen)
+        dudosos = superior >= max(_limite(inferior, k), 1)
+        if np.array_equal(inferior[dudosos], superior[dudosos]):
+            conteos = inferior
+
+    if conteos is None:
+        # Conteo directo sobre las personas filtradas
+        ids = np.asarray(cedula_ids, dtype=np.int64)
+        ids = np.unique(ids[(ids >= 0) & (ids < len(datos["valor"]))])
+        ids = ids[datos["valor"][ids] >= 0]
+        conteos = np.bincount(datos["valor"][ids], minlength=len(excluidos)).astype(
+            np.int64
+        )
+        conteos[excluidos] = 0
+        total = len(ids)
+
+        def sub(elegidos):
+            return _sub_de_personas(datos, ids, elegidos)
+
+    elegidos = np.flatnonzero(conteos >= max(_limite(conteos, k), 1))
+    resultado = pd.DataFrame(
+        {
+            columna: pd.Categorical.from_codes(elegidos, dtype=datos["valores"]),
+            "personas": conteos[elegidos],
+        }
+    )
+    if datos["subvalores"] is not None:
+        por_sub = sub(elegidos)
+        resultado[subcolumna] = pd.Categorical.from_codes(
+            np.where(por_sub.sum(axis=1) > 0, por_sub.argmax(axis=1), -1),
+            dtype=datos["subvalores"],
+        )
+    return resultado, total